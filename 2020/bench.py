@@ -0,0 +1,542 @@
+#!/usr/bin/env python
+"""Benchmarks for the 2020 Temporal pipeline.
+
+Benchmarks that run Solve start their own in-process workers on the
+regular task queues, so stop any other workers before running them.
+"""
+
+import asyncio
+import contextlib
+import math
+import random
+import statistics
+import time
+import types
+import uuid
+from collections.abc import AsyncIterator
+from typing import Any
+
+import click
+import temporalio.api.history.v1
+from temporalio import client
+from temporalio.api.enums.v1 import EventType
+
+import common
+import connection
+import worker
+import workflows
+from solutions import ksum
+
+
+async def _history_events(
+    temporal_client: client.Client, workflow_id: str, run_id: str | None
+) -> AsyncIterator[temporalio.api.history.v1.HistoryEvent]:
+    """Get the history events of a workflow and all its children."""
+    handle = temporal_client.get_workflow_handle(workflow_id, run_id=run_id)
+    async for event in handle.fetch_history_events():
+        yield event
+        if event.HasField("child_workflow_execution_started_event_attributes"):
+            child = event.child_workflow_execution_started_event_attributes
+            async for child_event in _history_events(
+                temporal_client,
+                child.workflow_execution.workflow_id,
+                child.workflow_execution.run_id,
+            ):
+                yield child_event
+
+
+async def _history_bytes(
+    temporal_client: client.Client, workflow_id: str, run_id: str | None
+) -> int:
+    """Get the size of the history of a workflow and all its children."""
+    return sum(
+        [
+            event.ByteSize()
+            async for event in _history_events(
+                temporal_client, workflow_id, run_id
+            )
+        ]
+    )
+
+
+async def _workflow_task_latencies(
+    temporal_client: client.Client, workflow_id: str, run_id: str | None
+) -> list[float]:
+    """Get how long each workflow task took, in seconds.
+
+    This covers the workflow and all its children, and is measured
+    from when a worker picked up each task to when it completed it.
+    """
+    latencies = []
+    started = None
+    async for event in _history_events(temporal_client, workflow_id, run_id):
+        if event.event_type == EventType.EVENT_TYPE_WORKFLOW_TASK_STARTED:
+            started = event.event_time.ToDatetime()
+        elif (
+            event.event_type == EventType.EVENT_TYPE_WORKFLOW_TASK_COMPLETED
+            and started is not None
+        ):
+            latencies.append(
+                (event.event_time.ToDatetime() - started).total_seconds()
+            )
+    return latencies
+
+
+PHASES = ("input fetch", "example fetch", "examples", "solve", "submit")
+
+_PHASES_BY_TYPE = {
+    "fetch_input_data": "input fetch",
+    "fetch_examples": "example fetch",
+    "check_function_examples": "examples",
+    "set_answer": "submit",
+}
+
+
+def _get_phase(type_name: str, task_id: str) -> str | None:
+    if task_id.startswith("run-"):
+        # The real solution, run by execute_solution()
+        return "solve"
+    return _PHASES_BY_TYPE.get(type_name)
+
+
+async def _child_phase_durations(
+    temporal_client: client.Client,
+    attrs: (
+        temporalio.api.history.v1.ChildWorkflowExecutionStartedEventAttributes
+    ),
+) -> dict[str, float]:
+    child = attrs.workflow_execution
+    durations = await phase_durations(
+        temporal_client, child.workflow_id, child.run_id
+    )
+    if attrs.workflow_type.name == "SolvePart":
+        handle = temporal_client.get_workflow_handle(
+            child.workflow_id, run_id=child.run_id
+        )
+        durations["examples"] += await handle.query(
+            workflows.SolvePart.examples_seconds
+        )
+    return durations
+
+
+async def phase_durations(
+    temporal_client: client.Client, workflow_id: str, run_id: str | None
+) -> dict[str, float]:
+    """Get the time a Solve run spent in each of PHASES, in seconds.
+
+    Each activity or child workflow is timed from when it was
+    scheduled to when it finished, so queueing time is included. Parts
+    that ran concurrently are counted separately. Examples that
+    SolvePart checks inline are timed by querying it, so this needs a
+    running worker.
+    """
+    durations = dict.fromkeys(PHASES, 0.0)
+    started = {}
+    handle = temporal_client.get_workflow_handle(workflow_id, run_id=run_id)
+    async for event in handle.fetch_history_events():
+        field = event.WhichOneof("attributes")
+        if field is None:
+            continue
+        attrs = getattr(event, field)
+        if field == "activity_task_scheduled_event_attributes":
+            phase = _get_phase(attrs.activity_type.name, attrs.activity_id)
+        elif (
+            field
+            == "start_child_workflow_execution_initiated_event_attributes"
+        ):
+            phase = _get_phase(attrs.workflow_type.name, attrs.workflow_id)
+        else:
+            phase = None
+        if phase is not None:
+            started[event.event_id] = (phase, event.event_time.ToDatetime())
+
+        start_id = getattr(attrs, "scheduled_event_id", None) or getattr(
+            attrs, "initiated_event_id", None
+        )
+        if field.endswith("_started_event_attributes"):
+            # Started events refer to the scheduled or initiated event
+            # too, but the phase isn't over until it completes
+            if field == "child_workflow_execution_started_event_attributes":
+                for phase, duration in (
+                    await _child_phase_durations(temporal_client, attrs)
+                ).items():
+                    durations[phase] += duration
+        elif start_id in started:
+            phase, start = started.pop(start_id)
+            durations[phase] += (
+                event.event_time.ToDatetime() - start
+            ).total_seconds()
+    return durations
+
+
+async def _run_solve(
+    temporal_client: client.Client, data: workflows.SolveInput
+) -> tuple[float, int]:
+    start = time.perf_counter()
+    handle = await temporal_client.start_workflow(
+        workflows.Solve,
+        data,
+        id=data.task_id,
+        task_queue=common.TASK_QUEUE_NAME,
+    )
+    await handle.result()
+    elapsed = time.perf_counter() - start
+    return elapsed, await _history_bytes(
+        temporal_client, handle.id, handle.result_run_id
+    )
+
+
+@contextlib.asynccontextmanager
+async def _worker(
+    *, compress: bool = False, local: bool = False, **kwargs: Any
+) -> AsyncIterator[client.Client]:
+    """Get a client with in-process workers running.
+
+    kwargs are passed to worker.create_workers().
+    """
+    if local:
+        async with worker.local_worker(
+            compress=compress, **kwargs
+        ) as temporal_client:
+            yield temporal_client
+    else:
+        temporal_client = await connection.connect(compress=compress)
+        async with worker.run_workers(temporal_client, **kwargs):
+            yield temporal_client
+
+
+async def _compression(
+    day: int, session_token: str, *, runs: int, fast: bool, local: bool
+) -> None:
+    click.echo(
+        f"{'mode':<12} {'history bytes':>14} {'median s':>9} {'min s':>9}"
+    )
+    for compress in (False, True):
+        async with _worker(compress=compress, local=local) as temporal_client:
+            # Always solve, rather than reusing a memoized answer or an
+            # earlier run's workflow
+            results = [
+                await _run_solve(
+                    temporal_client,
+                    workflows.SolveInput(
+                        day,
+                        session_token,
+                        fast,
+                        force=True,
+                        nonce=uuid.uuid4().hex,
+                    ),
+                )
+                for _ in range(runs)
+            ]
+        latencies = [elapsed for elapsed, _ in results]
+        history_bytes = results[-1][1]
+        mode = "compressed" if compress else "plain"
+        click.echo(
+            f"{mode:<12} {history_bytes:>14} "
+            f"{statistics.median(latencies):>9.3f} {min(latencies):>9.3f}"
+        )
+
+
+def _ksum_entries(
+    size: int, k: int, rng: random.Random, *, match: bool
+) -> tuple[list[int], int]:
+    """Get distinct random entries and a target for a k-sum search.
+
+    Filler entries are multiples of k + 1, and up to k entries are
+    planted one above a multiple, so a k-sum hits the target (which is
+    k above a multiple) only if it uses exactly k planted entries. If
+    match is set, k are planted and only they match; otherwise k - 1
+    are, and nothing matches. Either way, every entry has to be
+    considered, unlike with dense random data, where some accidental
+    match is found almost at once.
+    """
+    modulus = k + 1
+    values = rng.sample(range(1, 10 * size + 1), size)
+    planted = [
+        value * modulus + 1 for value in values[: k if match else k - 1]
+    ]
+    filler = [value * modulus for value in values[len(planted) :]]
+    target = sum(planted)
+    if not match:
+        # Stand in a filler entry plus one for the missing planted
+        # entry, so the target is in the same range
+        target += filler[0] + 1
+    entries = planted + filler
+    rng.shuffle(entries)
+    return entries, target
+
+
+# Skip searches that would take too long: the worst case is O(n^(k-1))
+_KSUM_MAX_STEPS = 10**8
+
+
+def _ksum(sizes: list[int], ks: list[int], runs: int, seed: int) -> None:
+    rng = random.Random(seed)  # noqa: S311
+    click.echo(
+        f"{'k':>2} {'entries':>9} {'case':>6} {'median ms':>10} {'max ms':>10}"
+    )
+    for k in ks:
+        for size in sizes:
+            for match in (True, False):
+                case = "match" if match else "none"
+                if size ** (k - 1) > _KSUM_MAX_STEPS:
+                    click.echo(f"{k:>2} {size:>9} {case:>6} {'skipped':>10}")
+                    continue
+                latencies = []
+                for _ in range(runs):
+                    entries, target = _ksum_entries(size, k, rng, match=match)
+                    start = time.perf_counter()
+                    found = ksum.find(entries, k, target)
+                    latencies.append((time.perf_counter() - start) * 1000)
+                    assert (found is not None) == match
+                click.echo(
+                    f"{k:>2} {size:>9} {case:>6} "
+                    f"{statistics.median(latencies):>10.2f} "
+                    f"{max(latencies):>10.2f}"
+                )
+
+
+_SANDBOX_MODES = {
+    "sandboxed": {"passthrough_modules": ()},
+    "passthrough": {},
+    "trusted": {"trusted_solutions": True},
+}
+
+
+async def _passthrough(
+    day: int, session_token: str, *, runs: int, local: bool
+) -> None:
+    # Always recompute and run the examples, since SolvePart runs them
+    # inline in its workflow tasks
+    data = workflows.SolveInput(day, session_token, force=True)
+    click.echo(
+        f"{'mode':<12} {'tasks':>6} {'median ms':>10} {'p95 ms':>9} "
+        f"{'total s':>8}"
+    )
+    for mode, worker_args in _SANDBOX_MODES.items():
+        latencies = []
+        totals = []
+        async with _worker(local=local, **worker_args) as temporal_client:
+            for _ in range(runs):
+                handle = await temporal_client.start_workflow(
+                    workflows.Solve,
+                    data,
+                    id=data.task_id,
+                    task_queue=common.TASK_QUEUE_NAME,
+                )
+                await handle.result()
+                run_latencies = await _workflow_task_latencies(
+                    temporal_client, handle.id, handle.result_run_id
+                )
+                latencies.extend(run_latencies)
+                totals.append(sum(run_latencies))
+        p95 = statistics.quantiles(latencies, n=20)[-1]
+        click.echo(
+            f"{mode:<12} {len(latencies) // runs:>6} "
+            f"{statistics.median(latencies) * 1000:>10.2f} "
+            f"{p95 * 1000:>9.2f} {statistics.median(totals):>8.3f}"
+        )
+
+
+async def _local_activities(
+    day: int, session_token: str, *, runs: int, local: bool
+) -> None:
+    click.echo(f"{'mode':<10} {'events':>7} {'median s':>9} {'min s':>9}")
+    async with _worker(local=local) as temporal_client:
+        for local_activities in (False, True):
+            latencies = []
+            for _ in range(runs):
+                # Fast, so the run is mostly AOC API calls (which hit
+                # the fetch cache after the first run) and scheduling
+                data = workflows.SolveInput(
+                    day,
+                    session_token,
+                    fast=True,
+                    nonce=uuid.uuid4().hex,
+                    local_activities=local_activities,
+                )
+                elapsed, _ = await _run_solve(temporal_client, data)
+                latencies.append(elapsed)
+            events = len(
+                [
+                    event
+                    async for event in _history_events(
+                        temporal_client, data.task_id, None
+                    )
+                ]
+            )
+            mode = "local" if local_activities else "regular"
+            click.echo(
+                f"{mode:<10} {events:>7} "
+                f"{statistics.median(latencies):>9.3f} {min(latencies):>9.3f}"
+            )
+
+
+class _SlowAocd:
+    """A stand-in for aocd whose API calls block for a while."""
+
+    def __init__(self, delay: float) -> None:
+        self.delay = delay
+
+    def get_data(self, **_kwargs: Any) -> str:
+        time.sleep(self.delay)
+        return "1\n2\n3"
+
+    def get_puzzle(self, **_kwargs: Any) -> Any:
+        time.sleep(self.delay)
+        return types.SimpleNamespace(examples=[])
+
+
+async def _aocd_concurrency(
+    requests: int, delay: float, threads: int, *, local: bool
+) -> None:
+    # A new session token each time means the fetch cache always misses
+    session_token = uuid.uuid4().hex
+    async with _worker(
+        local=local, aoc=_SlowAocd(delay), io_threads=threads
+    ) as temporal_client:
+        start = time.perf_counter()
+        await asyncio.gather(
+            *(
+                temporal_client.execute_workflow(
+                    workflows.Prefetch.run,
+                    workflows.PrefetchInput(session_token, day),
+                    id=f"bench-prefetch-{session_token}-{day}",
+                    task_queue=common.TASK_QUEUE_NAME,
+                )
+                for day in range(1, requests + 1)
+            )
+        )
+        elapsed = time.perf_counter() - start
+    # Each prefetch makes two calls, for the input and the examples
+    calls = requests * 2
+    click.echo(f"{calls} calls of {delay:.2f}s on {threads} threads")
+    click.echo(f"  serialized:  {calls * delay:>7.2f}s")
+    click.echo(f"  ideal:       {math.ceil(calls / threads) * delay:>7.2f}s")
+    click.echo(f"  measured:    {elapsed:>7.2f}s")
+
+
+@click.group()
+def bench() -> None:
+    pass
+
+
+@bench.command()
+@click.option("--aoc-session", envvar="AOC_SESSION", help="AOC session secret")
+@click.option("-n", "--runs", help="Runs per mode", type=int, default=3)
+@click.option(
+    "-f",
+    "--fast",
+    help="Only run the actual problem, skipping examples and unit tests",
+    is_flag=True,
+    default=False,
+)
+@click.option(
+    "--local",
+    help="Use an embedded Temporal server instead of localhost:7233",
+    is_flag=True,
+    default=False,
+)
+@click.argument("day", type=int)
+def compression(
+    *, aoc_session: str, runs: int, fast: bool, local: bool, day: int
+) -> None:
+    """Compare history size and latency with and without compression."""
+    asyncio.run(
+        _compression(day, aoc_session, runs=runs, fast=fast, local=local)
+    )
+
+
+@bench.command()
+@click.option("--aoc-session", envvar="AOC_SESSION", help="AOC session secret")
+@click.option("-n", "--runs", help="Runs per mode", type=int, default=3)
+@click.option(
+    "--local",
+    help="Use an embedded Temporal server instead of localhost:7233",
+    is_flag=True,
+    default=False,
+)
+@click.argument("day", type=int)
+def passthrough(*, aoc_session: str, runs: int, local: bool, day: int) -> None:
+    """Compare workflow task latency with different sandbox settings.
+
+    Pick a day with several examples, since examples for solution
+    classes run inline in SolvePart's workflow tasks.
+    """
+    asyncio.run(_passthrough(day, aoc_session, runs=runs, local=local))
+
+
+@bench.command("local-activities")
+@click.option("--aoc-session", envvar="AOC_SESSION", help="AOC session secret")
+@click.option("-n", "--runs", help="Runs per mode", type=int, default=5)
+@click.option(
+    "--local",
+    help="Use an embedded Temporal server instead of localhost:7233",
+    is_flag=True,
+    default=False,
+)
+@click.argument("day", type=int)
+def local_activities(
+    *, aoc_session: str, runs: int, local: bool, day: int
+) -> None:
+    """Compare Solve overhead with regular and local AOC activities."""
+    asyncio.run(_local_activities(day, aoc_session, runs=runs, local=local))
+
+
+@bench.command("aocd-concurrency")
+@click.option(
+    "-n",
+    "--requests",
+    help="Number of days to prefetch at once (at most 25)",
+    type=click.IntRange(1, 25),
+    default=8,
+)
+@click.option(
+    "--delay", help="Seconds each fake AOC call blocks", type=float, default=1
+)
+@click.option(
+    "--threads",
+    help="I/O worker threads",
+    type=int,
+    default=worker.DEFAULT_IO_THREADS,
+)
+@click.option(
+    "--local",
+    help="Use an embedded Temporal server instead of localhost:7233",
+    is_flag=True,
+    default=False,
+)
+def aocd_concurrency(
+    *, requests: int, delay: float, threads: int, local: bool
+) -> None:
+    """Check that blocking AOC API calls run concurrently.
+
+    This uses a fake aocd that sleeps instead of calling AOC.
+    """
+    asyncio.run(_aocd_concurrency(requests, delay, threads, local=local))
+
+
+@bench.command("ksum")
+@click.option(
+    "-s",
+    "--sizes",
+    help="Comma-separated numbers of entries",
+    default="1000,10000,100000,1000000",
+)
+@click.option(
+    "-k",
+    "ks",
+    help="Numbers of entries to sum (may be given more than once)",
+    type=int,
+    multiple=True,
+    default=[2, 3],
+)
+@click.option("-n", "--runs", help="Runs per size", type=int, default=5)
+@click.option("--seed", help="Random seed", type=int, default=2020)
+def ksum_(sizes: str, ks: tuple[int, ...], runs: int, seed: int) -> None:
+    """Measure how the day 1 k-sum search scales with input size."""
+    _ksum([int(size) for size in sizes.split(",")], list(ks), runs, seed)
+
+
+if __name__ == "__main__":
+    bench()
@@ -1,34 +1,339 @@
 #!/usr/bin/env python
 
 import asyncio
+import contextlib
+import math
+import statistics
+import time
+import uuid
+from collections.abc import AsyncIterator, Callable
+from typing import Any
 
 import click
 from loguru import logger
 from temporalio import client
+from temporalio.common import WorkflowIDConflictPolicy
 
+import bench
 import common
+import connection
+import manifest
+import worker
 import workflows
 
 
-async def _main(day: int, session_token: str, *, fast: bool = False) -> None:
-    temporal_client = await client.Client.connect("localhost:7233")
-    data = workflows.SolveInput(day, session_token, fast)
+def _parse_days(
+    _ctx: click.Context, _param: click.Parameter, value: str | None
+) -> list[int]:
+    """Parse a single day ("5") or an inclusive range of days ("1-10")."""
+    if value is None:
+        return []
+    first, _, last = value.partition("-")
+    try:
+        return list(range(int(first), int(last or first) + 1))
+    except ValueError:
+        msg = f"{value!r} is not a day or range"
+        raise click.BadParameter(msg) from None
+
+
+async def _execute(
+    temporal_client: client.Client,
+    run: Callable,
+    data: workflows.SolveInput | workflows.SolveManyInput,
+    *,
+    result_type: type,
+    reuse_window: float,
+) -> Any:
+    """Run a workflow, or reuse an identical one.
+
+    If an identical workflow is already running, this waits for it
+    rather than failing. Unless data.force is set, the result of one
+    that completed within reuse_window seconds is reused. Workflow IDs
+    don't cover the solutions' source, so a reused result may be from
+    before a solution was changed.
+    """
+    if (
+        reuse_window
+        and not data.force
+        and (
+            output := await workflows.get_reusable_result(
+                temporal_client,
+                data.task_id,
+                max_age=reuse_window,
+                result_type=result_type,
+            )
+        )
+        is not None
+    ):
+        logger.info("Reusing result of existing workflow {}", data.task_id)
+        return output
+    return await temporal_client.execute_workflow(
+        run,
+        data,
+        id=data.task_id,
+        task_queue=common.TASK_QUEUE_NAME,
+        id_conflict_policy=WorkflowIDConflictPolicy.USE_EXISTING,
+    )
+
+
+async def _solve(
+    temporal_client: client.Client,
+    data: workflows.SolveInput,
+    *,
+    reuse_window: float = 0,
+) -> None:
     logger.debug("Running {} with {}", workflows.Solve, data)
     try:
-        output = await temporal_client.execute_workflow(
-            workflows.Solve,
+        output = await _execute(
+            temporal_client,
+            workflows.Solve.run,
             data,
-            id=data.task_id,
-            task_queue=common.TASK_QUEUE_NAME,
+            result_type=workflows.SolveOutput,
+            reuse_window=reuse_window,
         )
     except client.WorkflowFailureError as err:
         logger.error("Workflow failed: {}", err)
     else:
         for part, answer in output.answers:
-            logger.info("Day {} {}: {}", day, part, answer)
+            logger.info("Day {} {}: {}", data.day, part, answer)
+        logger.info(
+            "Submitted {} answers, skipped {} with known verdicts",
+            output.submitted,
+            output.skipped,
+        )
+
+
+def _print_summary(output: workflows.SolveManyOutput) -> None:
+    click.echo(
+        f"{'day':>3}  {'part 1':<20} {'part 2':<20} {'time':>9} "
+        f"{'submitted':>9} {'skipped':>7}"
+    )
+    for result in output.results:
+        if result.error is None:
+            part1, part2 = (str(answer) for _, answer in result.answers)
+        else:
+            part1, part2 = f"error: {result.error}", ""
+        click.echo(
+            f"{result.day:>3}  {part1:<20} {part2:<20} "
+            f"{result.seconds:>8.2f}s {result.submitted:>9} "
+            f"{result.skipped:>7}"
+        )
+    click.echo(
+        f"Submitted {sum(r.submitted for r in output.results)} answers, "
+        f"skipped {sum(r.skipped for r in output.results)} with known "
+        "verdicts"
+    )
+
+
+async def _solve_many(
+    temporal_client: client.Client, data: workflows.SolveManyInput
+) -> None:
+    logger.debug("Running {} with {}", workflows.SolveMany, data)
+    try:
+        output = await _execute(
+            temporal_client,
+            workflows.SolveMany.run,
+            data,
+            result_type=workflows.SolveManyOutput,
+            reuse_window=data.reuse_window,
+        )
+    except client.WorkflowFailureError as err:
+        logger.error("Workflow failed: {}", err)
+    else:
+        _print_summary(output)
+
+
+async def _run(
+    temporal_client: client.Client,
+    days: list[int],
+    session_token: str,
+    *,
+    max_concurrent: int,
+    reuse_window: float,
+    **options: Any,
+) -> None:
+    """Solve the given days.
+
+    options are passed to SolveInput or SolveManyInput. Forced runs get
+    a nonce, so they start new workflows rather than joining identical
+    ones that are still running.
+    """
+    if options.get("force"):
+        options["nonce"] = uuid.uuid4().hex
+    if len(days) == 1:
+        await _solve(
+            temporal_client,
+            workflows.SolveInput(days[0], session_token, **options),
+            reuse_window=reuse_window,
+        )
+    else:
+        await _solve_many(
+            temporal_client,
+            workflows.SolveManyInput(
+                days,
+                session_token,
+                max_concurrent=max_concurrent,
+                reuse_window=reuse_window,
+                **options,
+            ),
+        )
+
+
+@contextlib.asynccontextmanager
+async def _client(
+    *, compress: bool = False, local: bool = False
+) -> AsyncIterator[client.Client]:
+    if local:
+        async with worker.local_worker(compress=compress) as temporal_client:
+            yield temporal_client
+    else:
+        yield await connection.connect(compress=compress)
+
+
+async def _main(
+    days: list[int],
+    session_token: str,
+    *,
+    compress: bool = False,
+    local: bool = False,
+    **options: Any,
+) -> None:
+    async with _client(compress=compress, local=local) as temporal_client:
+        await _run(temporal_client, days, session_token, **options)
+
 
+def _percentile(values: list[float], percent: int) -> float:
+    """Get a percentile of values using the nearest-rank method."""
+    values = sorted(values)
+    return values[max(0, math.ceil(len(values) * percent / 100) - 1)]
 
-@click.command()
+
+async def _bench(
+    day: int,
+    session_token: str,
+    *,
+    runs: int,
+    compress: bool = False,
+    local: bool = False,
+    **options: Any,
+) -> None:
+    """Solve a day several times and report how long each phase took."""
+    results: dict[str, list[float]] = {
+        phase: [] for phase in (*bench.PHASES, "total")
+    }
+    async with _client(compress=compress, local=local) as temporal_client:
+        for i in range(runs):
+            # Recompute every time, or later runs would reuse the
+            # first run's answers
+            data = workflows.SolveInput(
+                day,
+                session_token,
+                force=True,
+                nonce=uuid.uuid4().hex,
+                **options,
+            )
+            start = time.perf_counter()
+            handle = await temporal_client.start_workflow(
+                workflows.Solve,
+                data,
+                id=data.task_id,
+                task_queue=common.TASK_QUEUE_NAME,
+            )
+            await handle.result()
+            results["total"].append(time.perf_counter() - start)
+            for phase, duration in (
+                await bench.phase_durations(
+                    temporal_client, handle.id, handle.result_run_id
+                )
+            ).items():
+                results[phase].append(duration)
+            logger.info("Run {}: {:.3f}s", i + 1, results["total"][-1])
+
+    click.echo(f"{'phase':<14} {'min s':>9} {'median s':>9} {'p95 s':>9}")
+    for phase, durations in results.items():
+        click.echo(
+            f"{phase:<14} {min(durations):>9.3f} "
+            f"{statistics.median(durations):>9.3f} "
+            f"{_percentile(durations, 95):>9.3f}"
+        )
+
+
+PREFETCH_SCHEDULE_ID = f"aoc-{common.YEAR}-prefetch"
+
+
+async def _prefetch(
+    temporal_client: client.Client, session_token: str, day: int
+) -> None:
+    input_ref = await temporal_client.execute_workflow(
+        workflows.Prefetch.run,
+        workflows.PrefetchInput(session_token, day),
+        id=f"prefetch-{common.YEAR}-{day:02}",
+        task_queue=common.TASK_QUEUE_NAME,
+        id_conflict_policy=WorkflowIDConflictPolicy.USE_EXISTING,
+    )
+    logger.info("Prefetched day {} (input {})", day, input_ref)
+
+
+async def _schedule_prefetch(
+    temporal_client: client.Client, session_token: str
+) -> None:
+    """Create or update the schedule that prefetches each day at unlock."""
+    schedule = client.Schedule(
+        action=client.ScheduleActionStartWorkflow(
+            workflows.Prefetch.run,
+            workflows.PrefetchInput(session_token),
+            id=f"prefetch-{common.YEAR}",
+            task_queue=common.TASK_QUEUE_NAME,
+        ),
+        spec=client.ScheduleSpec(
+            calendars=[
+                client.ScheduleCalendarSpec(
+                    second=[client.ScheduleRange(0)],
+                    minute=[client.ScheduleRange(0)],
+                    # Midnight in workflows.UNLOCK_TIMEZONE
+                    hour=[client.ScheduleRange(5)],
+                    day_of_month=[client.ScheduleRange(1, 25)],
+                    month=[client.ScheduleRange(12)],
+                    year=[client.ScheduleRange(common.YEAR)],
+                )
+            ]
+        ),
+    )
+    try:
+        handle = await temporal_client.create_schedule(
+            PREFETCH_SCHEDULE_ID, schedule
+        )
+    except client.ScheduleAlreadyRunningError:
+        handle = temporal_client.get_schedule_handle(PREFETCH_SCHEDULE_ID)
+        await handle.update(lambda _: client.ScheduleUpdate(schedule))
+    desc = await handle.describe()
+    if next_times := desc.info.next_action_times:
+        logger.info("Next prefetch at {}", next_times[0])
+    else:
+        logger.warning("All {} puzzles have already unlocked", common.YEAR)
+
+
+class _DefaultGroup(click.Group):
+    """A group that runs solve if the first argument isn't a command.
+
+    This keeps `cli.py 5` working alongside `cli.py bench 5`.
+    """
+
+    def parse_args(self, ctx: click.Context, args: list[str]) -> list[str]:
+        if not args or (
+            args[0] not in self.commands
+            and args[0] not in ctx.help_option_names
+        ):
+            args = ["solve", *args]
+        return super().parse_args(ctx, args)
+
+
+@click.group(cls=_DefaultGroup)
+def cli() -> None:
+    pass
+
+
+@cli.command()
 @click.option("--aoc-session", envvar="AOC_SESSION", help="AOC session secret")
 @click.option(
     "-f",
@@ -37,9 +342,220 @@ async def _main(day: int, session_token: str, *, fast: bool = False) -> None:
     is_flag=True,
     default=False,
 )
+@click.option(
+    "-c",
+    "--concurrent",
+    help="Solve part 1 and part 2 at the same time",
+    is_flag=True,
+    default=False,
+)
+@click.option(
+    "--fail-fast",
+    help="Stop checking examples as soon as one is wrong",
+    is_flag=True,
+    default=False,
+)
+@click.option(
+    "--force",
+    help="Recompute answers even if the input and solution are unchanged",
+    is_flag=True,
+    default=False,
+)
+@click.option(
+    "--local-activities",
+    help=(
+        "Call the AOC API from local activities on the compute worker, "
+        "falling back to the I/O worker if they keep failing"
+    ),
+    is_flag=True,
+    default=False,
+)
+@click.option(
+    "--compress",
+    envvar="AOC_COMPRESS",
+    help="Compress large payloads (must match the worker setting)",
+    is_flag=True,
+    default=False,
+)
+@click.option(
+    "--local",
+    help=(
+        "Run against an embedded Temporal server with an in-process "
+        "worker instead of connecting to a running server"
+    ),
+    is_flag=True,
+    default=False,
+)
+@click.option(
+    "-a",
+    "--all",
+    "all_days",
+    help="Solve every day that has a solution",
+    is_flag=True,
+    default=False,
+)
+@click.option(
+    "-j",
+    "--max-concurrent",
+    help="Maximum number of days to solve at once",
+    type=int,
+    default=4,
+)
+@click.option(
+    "--reuse-window",
+    help=(
+        "Reuse the answers from an identical run that finished within "
+        "this many seconds, even if a solution has changed since. "
+        "Identical runs that are still going are always waited for, "
+        "unless --force is given."
+    ),
+    type=float,
+    default=0,
+)
+@click.argument("days", required=False, callback=_parse_days)
+def solve(  # noqa: PLR0913
+    *,
+    aoc_session: str,
+    fast: bool,
+    concurrent: bool,
+    fail_fast: bool,
+    force: bool,
+    local_activities: bool,
+    compress: bool,
+    local: bool,
+    all_days: bool,
+    max_concurrent: int,
+    reuse_window: float,
+    days: list[int],
+) -> None:
+    """Solve DAYS, which is a single day (5) or a range of days (1-10)."""
+    available = manifest.days()
+    if all_days:
+        days = available
+    elif not days:
+        msg = "Give a day or range of days, or --all"
+        raise click.UsageError(msg)
+    for day in sorted(set(days) - set(available)):
+        logger.warning("No solution found for day {}, skipping", day)
+    days = [day for day in days if day in available]
+    if not days:
+        msg = "No solutions found"
+        raise click.UsageError(msg)
+
+    asyncio.run(
+        _main(
+            days,
+            aoc_session,
+            fast=fast,
+            concurrent=concurrent,
+            fail_fast=fail_fast,
+            force=force,
+            local_activities=local_activities,
+            compress=compress,
+            max_concurrent=max_concurrent,
+            reuse_window=reuse_window,
+            local=local,
+        )
+    )
+
+
+@cli.command("bench")
+@click.option("--aoc-session", envvar="AOC_SESSION", help="AOC session secret")
+@click.option("-n", "--runs", help="Number of runs", type=int, default=5)
+@click.option(
+    "-f",
+    "--fast",
+    help="Only run the actual problem, skipping examples and unit tests",
+    is_flag=True,
+    default=False,
+)
+@click.option(
+    "-c",
+    "--concurrent",
+    help="Solve part 1 and part 2 at the same time",
+    is_flag=True,
+    default=False,
+)
+@click.option(
+    "--compress",
+    envvar="AOC_COMPRESS",
+    help="Compress large payloads (must match the worker setting)",
+    is_flag=True,
+    default=False,
+)
+@click.option(
+    "--local",
+    help=(
+        "Run against an embedded Temporal server with an in-process "
+        "worker instead of connecting to a running server"
+    ),
+    is_flag=True,
+    default=False,
+)
 @click.argument("day", type=int)
-def cli(aoc_session: str, fast: bool, day: int) -> None:
-    asyncio.run(_main(day, aoc_session, fast=fast))
+def bench_(  # noqa: PLR0913
+    *,
+    aoc_session: str,
+    runs: int,
+    fast: bool,
+    concurrent: bool,
+    compress: bool,
+    local: bool,
+    day: int,
+) -> None:
+    """Time each phase of solving DAY, from the workflow histories.
+
+    Answers are always recomputed. Phases are input fetch, example
+    fetch, examples, solve, and submit.
+    """
+    asyncio.run(
+        _bench(
+            day,
+            aoc_session,
+            runs=runs,
+            fast=fast,
+            concurrent=concurrent,
+            compress=compress,
+            local=local,
+        )
+    )
+
+
+@cli.command()
+@click.option("--aoc-session", envvar="AOC_SESSION", help="AOC session secret")
+@click.option(
+    "--compress",
+    envvar="AOC_COMPRESS",
+    help="Compress large payloads (must match the worker setting)",
+    is_flag=True,
+    default=False,
+)
+@click.option(
+    "--schedule",
+    help="Schedule a prefetch of each day's puzzle as it unlocks",
+    is_flag=True,
+    default=False,
+)
+@click.argument("day", type=int, required=False)
+def prefetch(
+    *, aoc_session: str, compress: bool, schedule: bool, day: int | None
+) -> None:
+    """Fetch DAY's input and examples into the local cache.
+
+    If the puzzle hasn't unlocked yet, this waits for it.
+    """
+    if schedule == (day is not None):
+        msg = "Give either a day or --schedule"
+        raise click.UsageError(msg)
+
+    async def run() -> None:
+        temporal_client = await connection.connect(compress=compress)
+        if schedule:
+            await _schedule_prefetch(temporal_client, aoc_session)
+        else:
+            await _prefetch(temporal_client, aoc_session, day)
+
+    asyncio.run(run())
 
 
 if __name__ == "__main__":
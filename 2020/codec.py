@@ -0,0 +1,54 @@
+import dataclasses
+import zlib
+from collections.abc import Sequence
+
+from temporalio import converter
+from temporalio.api.common.v1 import Payload
+
+_ENCODING = b"binary/zlib"
+
+# Payloads smaller than this aren't worth the CPU time to compress
+DEFAULT_THRESHOLD = 1024
+
+
+class CompressionCodec(converter.PayloadCodec):
+    """Payload codec that zlib-compresses large payloads.
+
+    Payloads below the threshold, or that don't get any smaller, are
+    passed through untouched, so a worker using this codec can still
+    read uncompressed payloads.
+    """
+
+    def __init__(
+        self, threshold: int = DEFAULT_THRESHOLD, level: int = 6
+    ) -> None:
+        self._threshold = threshold
+        self._level = level
+
+    async def encode(self, payloads: Sequence[Payload]) -> list[Payload]:
+        return [self._encode(p) for p in payloads]
+
+    async def decode(self, payloads: Sequence[Payload]) -> list[Payload]:
+        return [self._decode(p) for p in payloads]
+
+    def _encode(self, payload: Payload) -> Payload:
+        data = payload.SerializeToString()
+        if len(data) < self._threshold:
+            return payload
+        compressed = zlib.compress(data, self._level)
+        if len(compressed) >= len(data):
+            return payload
+        return Payload(metadata={"encoding": _ENCODING}, data=compressed)
+
+    def _decode(self, payload: Payload) -> Payload:
+        if payload.metadata.get("encoding") != _ENCODING:
+            return payload
+        return Payload.FromString(zlib.decompress(payload.data))
+
+
+def get_data_converter(*, compress: bool = False) -> converter.DataConverter:
+    if not compress:
+        return converter.DataConverter.default
+    return dataclasses.replace(
+        converter.DataConverter.default, payload_codec=CompressionCodec()
+    )
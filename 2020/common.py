@@ -1,16 +1,104 @@
 import dataclasses
+import hashlib
+import os
+import pathlib
+import tempfile
 from typing import Any
 
 import temporalio.common
+from temporalio import workflow
+
+YEAR = 2020
+TASK_QUEUE_NAME = f"aoc-{YEAR}"
+IO_TASK_QUEUE_NAME = f"aoc-{YEAR}-io"
+# Activities that wait on other workflows, which must never hold the
+# slots that those workflows' activities need
+ATTACH_TASK_QUEUE_NAME = f"aoc-{YEAR}-attach"
+
+# The workflow sandbox restricts Path.expanduser(), and this module is
+# imported in the sandbox unless it's passed through
+CACHE_DIR = pathlib.Path(
+    os.path.expanduser(  # noqa: PTH111
+        os.environ.get("AOC_CACHE_DIR") or f"~/.cache/aoc-{YEAR}"
+    )
+)
+BLOB_DIR = CACHE_DIR / "blobs"
+
+
+def get_module_name(day: int) -> str:
+    """Get the name of the module that defines a day's solutions."""
+    return f"solutions.day{day:02}"
+
+
+def token_hash(session_token: str) -> str:
+    """Get a short hash of a session token, for use in cache keys."""
+    return hashlib.sha256(session_token.encode()).hexdigest()[:16]
+
+
+def _blob_path(ref: str) -> pathlib.Path:
+    return BLOB_DIR / ref[:2] / ref
+
+
+def put_blob(text: str) -> str:
+    """Store text in the local content-addressed blob store.
+
+    Returns the reference (the SHA-256 hex digest of the text) that
+    can be passed to get_blob() to retrieve it again.
+    """
+    data = text.encode()
+    ref = hashlib.sha256(data).hexdigest()
+    path = _blob_path(ref)
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Blobs can be written from several threads at once, so each
+        # writer needs its own temporary file
+        with tempfile.NamedTemporaryFile(
+            dir=path.parent, prefix=f"{ref}.", suffix=".tmp", delete=False
+        ) as tmp:
+            tmp.write(data)
+        pathlib.Path(tmp.name).replace(path)
+    return ref
+
+
+def get_blob(ref: str) -> str:
+    return _blob_path(ref).read_text()
 
 
 @dataclasses.dataclass
 class PartInput:
-    input_data: str
+    """Input to a solution.
+
+    Large puzzle inputs are not passed inline; instead, input_ref
+    holds a reference into the blob store, so that only the reference
+    is recorded in workflow history. Solutions should always use
+    get_input_data() rather than reading input_data directly.
+    """
+
+    input_data: str | None = None
     extra: dict[str, Any] | None = None
+    input_ref: str | None = None
 
+    def get_input_data(self) -> str:
+        if self.input_data is None:
+            # Blobs are content-addressed and never change, so reading
+            # one from inside a workflow is deterministic.
+            with workflow.unsafe.sandbox_unrestricted():
+                self.input_data = get_blob(self.input_ref)
+        return self.input_data
 
-NEVER_RETRY = temporalio.common.RetryPolicy(maximum_attempts=1)
 
-YEAR = 2020
-TASK_QUEUE_NAME = f"aoc-{YEAR}"
+@dataclasses.dataclass
+class Progress:
+    """Progress of a long-running solution function.
+
+    A solution function that takes a progress argument can
+    periodically set checkpoint to a JSON-serializable snapshot of its
+    state. The checkpoint is sent with the activity's heartbeats, and
+    if the activity is retried (e.g., after a worker restart), the
+    function gets the last checkpoint back and can resume from it.
+    """
+
+    checkpoint: Any = None
+
+
+NEVER_RETRY = temporalio.common.RetryPolicy(maximum_attempts=1)
@@ -0,0 +1,19 @@
+import temporalio.runtime
+from temporalio import client
+
+import codec
+
+TEMPORAL_ADDRESS = "localhost:7233"
+
+
+async def connect(
+    *,
+    compress: bool = False,
+    runtime: temporalio.runtime.Runtime | None = None,
+) -> client.Client:
+    return await client.Client.connect(
+        TEMPORAL_ADDRESS,
+        namespace="default",
+        data_converter=codec.get_data_converter(compress=compress),
+        runtime=runtime,
+    )
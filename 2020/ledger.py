@@ -0,0 +1,65 @@
+"""Local ledger of answers submitted to AOC.
+
+This lets set_answer skip the network round trip for any answer whose
+verdict is already known.
+"""
+
+import dataclasses
+import json
+
+import common
+
+LEDGER_PATH = common.CACHE_DIR / "submissions.jsonl"
+
+CORRECT = "correct"
+INCORRECT = "incorrect"
+
+
+@dataclasses.dataclass
+class Submission:
+    token_hash: str
+    day: int
+    part: str
+    answer: str
+    verdict: str
+
+
+def _submissions() -> list[Submission]:
+    try:
+        lines = LEDGER_PATH.read_text().splitlines()
+    except FileNotFoundError:
+        return []
+    return [Submission(**json.loads(line)) for line in lines if line]
+
+
+def lookup(session_token: str, day: int, part: str, answer: str) -> str | None:
+    """Get the known verdict for an answer, or None if it's unknown.
+
+    Once a part has been solved, every other answer for it is known to
+    be incorrect.
+    """
+    token_hash = common.token_hash(session_token)
+    verdict = None
+    for submission in _submissions():
+        if (submission.token_hash, submission.day, submission.part) != (
+            token_hash,
+            day,
+            part,
+        ):
+            continue
+        if submission.answer == answer:
+            return submission.verdict
+        if submission.verdict == CORRECT:
+            verdict = INCORRECT
+    return verdict
+
+
+def record(
+    session_token: str, day: int, part: str, answer: str, verdict: str
+) -> None:
+    submission = Submission(
+        common.token_hash(session_token), day, part, answer, verdict
+    )
+    LEDGER_PATH.parent.mkdir(parents=True, exist_ok=True)
+    with LEDGER_PATH.open("a") as ledger:
+        ledger.write(json.dumps(dataclasses.asdict(submission)) + "\n")
@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+"""Manifest of the solutions that exist for each day.
+
+The manifest is built by parsing the solution modules rather than
+importing them, so workers can register solutions without paying for
+importing every day and its dependencies at startup. Run this script
+to regenerate solutions/manifest.json after adding a solution; if the
+file is missing or older than a solution module, it is rebuilt in
+memory instead.
+"""
+
+import ast
+import functools
+import json
+import pathlib
+
+import click
+from loguru import logger
+
+import workflows
+
+SOLUTIONS_DIR = pathlib.Path(__file__).parent / "solutions"
+MANIFEST_PATH = SOLUTIONS_DIR / "manifest.json"
+
+WORKFLOW = "workflow"
+FUNCTION = "function"
+
+
+def _scan_names(
+    body: list[ast.stmt],
+) -> tuple[dict[str, str], dict[str, str], dict[str, dict[str, str]]]:
+    """Get a module's top-level definitions, aliases, and VARIANTS."""
+    kinds = {}
+    aliases = {}
+    variants = {}
+    for node in body:
+        if isinstance(node, ast.ClassDef):
+            kinds[node.name] = WORKFLOW
+        elif isinstance(node, ast.FunctionDef | ast.AsyncFunctionDef):
+            kinds[node.name] = FUNCTION
+        elif isinstance(node, ast.Assign):
+            for target in node.targets:
+                if not isinstance(target, ast.Name):
+                    continue
+                if target.id == "VARIANTS":
+                    variants = ast.literal_eval(node.value)
+                elif isinstance(node.value, ast.Name):
+                    aliases[target.id] = node.value.id
+    return kinds, aliases, variants
+
+
+def _scan_module(path: pathlib.Path) -> dict[str, str]:
+    """Get the solution names defined at the top level of a module.
+
+    Variants are the names listed in the module's VARIANTS dict (see
+    workflows._get_variants()). A variant that's an alias is resolved
+    to what it aliases if that's defined in the module; otherwise it's
+    assumed to be a function.
+    """
+    kinds, aliases, variants = _scan_names(
+        ast.parse(path.read_text(), str(path)).body
+    )
+    found = {}
+    for part in workflows.Part:
+        for name in (part.value.class_name, part.value.func_name):
+            if name in kinds:
+                found[name] = kinds[name]
+            for attr in variants.get(name, {}).values():
+                found[attr] = kinds.get(aliases.get(attr, attr), FUNCTION)
+    return found
+
+
+def _module_paths() -> dict[int, pathlib.Path]:
+    paths = {}
+    for day in range(1, 26):
+        path = SOLUTIONS_DIR / f"day{day:02}.py"
+        if path.exists():
+            paths[day] = path
+    return paths
+
+
+def build() -> dict[int, dict[str, str]]:
+    """Build the manifest by scanning the solution modules."""
+    return {day: _scan_module(path) for day, path in _module_paths().items()}
+
+
+def write() -> dict[int, dict[str, str]]:
+    manifest = build()
+    MANIFEST_PATH.write_text(json.dumps(manifest, indent=2) + "\n")
+    return manifest
+
+
+@functools.cache
+def load() -> dict[int, dict[str, str]]:
+    """Load the manifest, rebuilding it if it's out of date."""
+    try:
+        mtime = MANIFEST_PATH.stat().st_mtime
+        manifest = {
+            int(day): solutions
+            for day, solutions in json.loads(MANIFEST_PATH.read_text()).items()
+        }
+    except FileNotFoundError:
+        logger.warning("No solution manifest found, scanning solutions")
+        return build()
+    paths = _module_paths()
+    if paths.keys() != manifest.keys() or any(
+        path.stat().st_mtime > mtime for path in paths.values()
+    ):
+        logger.warning(
+            "Solution manifest is out of date, scanning solutions; "
+            "run manifest.py to update it"
+        )
+        return build()
+    return manifest
+
+
+def days() -> list[int]:
+    """Get the days that have at least one solution."""
+    return sorted(day for day, solutions in load().items() if solutions)
+
+
+def has_functions() -> bool:
+    return any(
+        kind == FUNCTION
+        for solutions in load().values()
+        for kind in solutions.values()
+    )
+
+
+@click.command()
+def main() -> None:
+    """Regenerate solutions/manifest.json."""
+    manifest = write()
+    for day, solutions in manifest.items():
+        logger.info("Day {}: {}", day, ", ".join(solutions))
+    logger.info("Wrote {}", MANIFEST_PATH)
+
+
+if __name__ == "__main__":
+    main()
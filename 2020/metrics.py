@@ -0,0 +1,148 @@
+"""Timing metrics for the workflows and activities run by a worker.
+
+Durations are recorded as histograms on the Temporal runtime's metric
+meter, so they're served from the same Prometheus endpoint as the
+SDK's own metrics. Workflows and activities that get a day or part
+(e.g., solutions) are labeled with them, so slow days stand out.
+"""
+
+import re
+import time
+from collections.abc import Sequence
+from datetime import timedelta
+from typing import Any
+
+import temporalio.common
+import temporalio.runtime
+from temporalio import activity, workflow
+from temporalio.worker import (
+    ActivityInboundInterceptor,
+    ExecuteActivityInput,
+    ExecuteWorkflowInput,
+    Interceptor,
+    WorkflowInboundInterceptor,
+    WorkflowInterceptorClassInput,
+)
+
+WORKFLOW_DURATION = "aoc_workflow_duration"
+ACTIVITY_DURATION = "aoc_activity_duration"
+
+
+def create_runtime(port: int) -> temporalio.runtime.Runtime:
+    """Create a runtime that serves Prometheus metrics on localhost."""
+    return temporalio.runtime.Runtime(
+        telemetry=temporalio.runtime.TelemetryConfig(
+            metrics=temporalio.runtime.PrometheusConfig(
+                bind_address=f"127.0.0.1:{port}"
+            )
+        )
+    )
+
+
+def _get_labels(args: Sequence[Any]) -> dict[str, str]:
+    """Get day and part labels from a workflow or activity's input."""
+    labels = {}
+    if args:
+        data = args[0]
+        problem = getattr(data, "problem", data)
+        if (day := getattr(problem, "day", None)) is not None:
+            labels["day"] = str(day)
+        if (part := getattr(data, "part", None)) is not None:
+            labels["part"] = str(part)
+    return labels
+
+
+# Solution classes run as dynamic workflows named after the day's module
+# and the class, e.g., "day01.Part1" (see
+# workflows.get_solution_workflow_type())
+_SOLUTION_WORKFLOW_TYPE = re.compile(r"day(\d+)\.(?:[Pp]art(\d))?")
+
+
+def _get_solution_labels(workflow_type: str) -> dict[str, str]:
+    """Get day and part labels from a solution's workflow type.
+
+    Dynamic workflows get their input as raw payloads, so this is the
+    only place solution workflows' labels can come from. Variants that
+    aren't named after their part are only labeled with the day.
+    """
+    labels = {}
+    if match := _SOLUTION_WORKFLOW_TYPE.match(workflow_type):
+        labels["day"] = str(int(match[1]))
+        if match[2]:
+            labels["part"] = f"part {match[2]}"
+    return labels
+
+
+# Interceptor methods keep the SDK base classes' parameter names, next
+# and input, even though they shadow builtins
+class TimingInterceptor(Interceptor):
+    def __init__(self, meter: temporalio.common.MetricMeter) -> None:
+        self._activity_duration = meter.create_histogram_timedelta(
+            ACTIVITY_DURATION,
+            "Time taken to run an activity",
+            "duration",
+        )
+
+    def intercept_activity(
+        self,
+        next: ActivityInboundInterceptor,  # noqa: A002
+    ) -> ActivityInboundInterceptor:
+        return _ActivityTimingInterceptor(next, self._activity_duration)
+
+    def workflow_interceptor_class(
+        self,
+        input: WorkflowInterceptorClassInput,  # noqa: A002, ARG002
+    ) -> type[WorkflowInboundInterceptor]:
+        return _WorkflowTimingInterceptor
+
+
+class _ActivityTimingInterceptor(ActivityInboundInterceptor):
+    def __init__(
+        self,
+        next: ActivityInboundInterceptor,  # noqa: A002
+        histogram: temporalio.common.MetricHistogramTimedelta,
+    ) -> None:
+        super().__init__(next)
+        self._histogram = histogram
+
+    async def execute_activity(
+        self,
+        input: ExecuteActivityInput,  # noqa: A002
+    ) -> Any:
+        start = time.monotonic()
+        try:
+            return await super().execute_activity(input)
+        finally:
+            self._histogram.record(
+                timedelta(seconds=time.monotonic() - start),
+                {
+                    "activity_type": activity.info().activity_type,
+                    **_get_labels(input.args),
+                },
+            )
+
+
+class _WorkflowTimingInterceptor(WorkflowInboundInterceptor):
+    async def execute_workflow(
+        self,
+        input: ExecuteWorkflowInput,  # noqa: A002
+    ) -> Any:
+        try:
+            return await super().execute_workflow(input)
+        finally:
+            # This uses workflow time, which spans all the workflow's
+            # tasks. The workflow metric meter skips recording during
+            # replay.
+            info = workflow.info()
+            workflow.metric_meter().create_histogram_timedelta(
+                WORKFLOW_DURATION,
+                "Time taken to run a workflow",
+                "duration",
+            ).record(
+                workflow.now() - info.start_time,
+                {
+                    "workflow_type": info.workflow_type,
+                    **_get_labels(input.args),
+                    **_get_solution_labels(info.workflow_type),
+                },
+            )
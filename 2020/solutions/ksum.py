@@ -0,0 +1,80 @@
+"""Find k entries that add up to a target.
+
+Two entries are found with a single pass over a hash set, in O(n).
+Three or more entries are found by sorting, then fixing the smallest
+entry and recursing down to a two-pointer scan, in O(n^(k-1)). Bounds
+on the smallest and largest possible sums skip entries that can't be
+part of a match.
+"""
+
+import bisect
+from collections.abc import Sequence
+
+# Pairs are found directly, rather than by fixing an entry and recursing
+_PAIR = 2
+
+
+def find(
+    entries: Sequence[int], k: int, target: int
+) -> tuple[int, ...] | None:
+    """Find k distinct entries whose sum is target.
+
+    Entries are distinct by position, so a value that appears twice
+    can be used twice. Returns the matching entries in ascending
+    order, or None if there is no match.
+    """
+    if k < 1:
+        msg = f"k must be at least 1, not {k}"
+        raise ValueError(msg)
+    if k > len(entries):
+        return None
+    if k == 1:
+        return (target,) if target in entries else None
+    if k == _PAIR:
+        return _find_pair(entries, target)
+    return _find_sorted(sorted(entries), 0, k, target)
+
+
+def _find_pair(entries: Sequence[int], target: int) -> tuple[int, int] | None:
+    seen = set()
+    for entry in entries:
+        if (other := target - entry) in seen:
+            return (min(entry, other), max(entry, other))
+        seen.add(entry)
+    return None
+
+
+def _find_sorted(
+    entries: list[int], start: int, k: int, target: int
+) -> tuple[int, ...] | None:
+    """Find k entries in entries[start:], which must be sorted."""
+    end = len(entries)
+    if k == _PAIR:
+        lo = start
+        # Entries bigger than target minus the smallest entry can't
+        # be in a match
+        hi = bisect.bisect_right(entries, target - entries[lo], lo + 1) - 1
+        while lo < hi:
+            total = entries[lo] + entries[hi]
+            if total == target:
+                return (entries[lo], entries[hi])
+            if total < target:
+                lo += 1
+            else:
+                hi -= 1
+        return None
+
+    largest = sum(entries[end - k + 1 :])
+    for i in range(start, end - k + 1):
+        first = entries[i]
+        if i > start and first == entries[i - 1]:
+            continue
+        if first + sum(entries[i + 1 : i + k]) > target:
+            # Every later entry is at least as big, so nothing after
+            # this can match either
+            break
+        if first + largest < target:
+            continue
+        if rest := _find_sorted(entries, i + 1, k - 1, target - first):
+            return (first, *rest)
+    return None
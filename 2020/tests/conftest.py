@@ -0,0 +1,23 @@
+import pathlib
+from collections.abc import AsyncIterator
+
+import pytest
+import pytest_asyncio
+from temporalio import testing
+
+import common
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(
+    tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch
+) -> pathlib.Path:
+    monkeypatch.setattr(common, "CACHE_DIR", tmp_path)
+    monkeypatch.setattr(common, "BLOB_DIR", tmp_path / "blobs")
+    return tmp_path
+
+
+@pytest_asyncio.fixture
+async def env() -> AsyncIterator[testing.WorkflowEnvironment]:
+    async with await testing.WorkflowEnvironment.start_time_skipping() as env:
+        yield env
@@ -0,0 +1,39 @@
+"""A stand-in for aocd, for tests that run the AOC API activities."""
+
+import threading
+import time
+import types
+from typing import Any
+
+import aocd.exceptions
+
+
+class FakeAocd:
+    """A stand-in for aocd whose API calls block for a while.
+
+    The first `locked` calls raise PuzzleLockedError, as aocd does
+    before a puzzle unlocks.
+    """
+
+    def __init__(self, delay: float = 0, locked: int = 0) -> None:
+        self.delay = delay
+        self.locked = locked
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _call(self, day: int) -> None:
+        with self._lock:
+            self.calls += 1
+            locked = self.calls <= self.locked
+        time.sleep(self.delay)
+        if locked:
+            msg = f"Day {day} is not unlocked yet"
+            raise aocd.exceptions.PuzzleLockedError(msg)
+
+    def get_data(self, *, day: int, **_kwargs: Any) -> str:
+        self._call(day)
+        return f"input for day {day}"
+
+    def get_puzzle(self, *, day: int, **_kwargs: Any) -> Any:
+        self._call(day)
+        return types.SimpleNamespace(examples=[])
@@ -0,0 +1,48 @@
+"""Tests for the activities that call the AOC API.
+
+The AOC API is replaced with a fake whose calls block, like aocd's
+HTTP requests do, so these exercise the I/O worker's thread pool.
+"""
+
+import concurrent.futures
+import datetime
+import uuid
+
+import pytest
+from fake_aocd import FakeAocd
+from temporalio import testing
+
+import common
+import workflows
+
+
+def test_put_blob_from_threads() -> None:
+    texts = [f"blob {i % 5}" for i in range(400)]
+    with concurrent.futures.ThreadPoolExecutor(32) as pool:
+        refs = list(pool.map(common.put_blob, texts))
+    assert [common.get_blob(ref) for ref in refs] == texts
+    assert not list(common.BLOB_DIR.glob("*/*.tmp"))
+
+
+def test_fetch_from_threads(monkeypatch: pytest.MonkeyPatch) -> None:
+    # A small cache, so that entries are evicted while others are
+    # being read and written
+    input_cache = workflows._FetchCache(  # noqa: SLF001
+        "input", ttl=datetime.timedelta(hours=1), max_entries=4
+    )
+    monkeypatch.setattr(workflows, "_INPUT_CACHE", input_cache)
+    solve = workflows.Solve(FakeAocd(delay=0.001))
+    session_token = uuid.uuid4().hex
+    days = [i % 12 + 1 for i in range(400)]
+
+    def fetch(day: int) -> str:
+        return testing.ActivityEnvironment().run(
+            solve.fetch_input_data, workflows.SolveInput(day, session_token)
+        )
+
+    with concurrent.futures.ThreadPoolExecutor(32) as pool:
+        refs = list(pool.map(fetch, days))
+    assert [common.get_blob(ref) for ref in refs] == [
+        f"input for day {day}" for day in days
+    ]
+    assert input_cache.hits + input_cache.misses == len(days)
@@ -0,0 +1,67 @@
+"""Tests for prefetching puzzles at unlock time."""
+
+import asyncio
+import time
+
+import pytest
+from fake_aocd import FakeAocd
+from temporalio import testing
+
+import common
+import worker
+import workflows
+
+
+@pytest.mark.asyncio
+async def test_prefetch_concurrently(env: testing.WorkflowEnvironment) -> None:
+    aoc = FakeAocd(delay=0.5)
+    days = range(1, 9)
+    async with worker.run_workers(env.client, aoc=aoc, io_threads=16):
+        start = time.perf_counter()
+        refs = await asyncio.gather(
+            *(
+                env.client.execute_workflow(
+                    workflows.Prefetch.run,
+                    workflows.PrefetchInput("token", day),
+                    id=f"prefetch-{day}",
+                    task_queue=common.TASK_QUEUE_NAME,
+                )
+                for day in days
+            )
+        )
+        elapsed = time.perf_counter() - start
+    assert [common.get_blob(ref) for ref in refs] == [
+        f"input for day {day}" for day in days
+    ]
+    # Each prefetch fetches the input and the examples, so one call at
+    # a time would take 8s
+    assert aoc.calls == 2 * len(days)
+    assert elapsed < 4
+
+
+@pytest.mark.asyncio
+async def test_prefetch_until_unlocked(
+    env: testing.WorkflowEnvironment,
+) -> None:
+    aoc = FakeAocd(locked=3)
+    async with worker.run_workers(env.client, aoc=aoc):
+        ref = await env.client.execute_workflow(
+            workflows.Prefetch.run,
+            workflows.PrefetchInput("token", 1),
+            id="prefetch-locked",
+            task_queue=common.TASK_QUEUE_NAME,
+        )
+    assert common.get_blob(ref) == "input for day 1"
+    # Three locked calls, then one good call each for the input and
+    # the examples
+    assert aoc.calls == 5
+
+    # Both are now cached, so prefetching again doesn't call AOC
+    async with worker.run_workers(env.client, aoc=aoc):
+        await env.client.execute_workflow(
+            workflows.Prefetch.run,
+            workflows.PrefetchInput("token", 1),
+            id="prefetch-cached",
+            task_queue=common.TASK_QUEUE_NAME,
+        )
+    assert aoc.calls == 5
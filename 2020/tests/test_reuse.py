@@ -0,0 +1,107 @@
+"""Tests for reusing and attaching to existing workflow executions."""
+
+import asyncio
+import dataclasses
+import datetime
+import types
+from typing import Any
+
+import pytest
+from fake_aocd import FakeAocd
+from temporalio import client, testing
+
+import common
+import worker
+import workflows
+
+
+@dataclasses.dataclass
+class _FakeHandle:
+    status: client.WorkflowExecutionStatus
+    close_time: datetime.datetime | None
+    result_type: type | None
+    value: Any
+
+    async def describe(self) -> Any:
+        return types.SimpleNamespace(
+            status=self.status, close_time=self.close_time
+        )
+
+    async def result(self) -> Any:
+        return self.value
+
+
+class _FakeClient:
+    def __init__(
+        self, status: client.WorkflowExecutionStatus, age: float
+    ) -> None:
+        self.status = status
+        self.close_time = datetime.datetime.now(
+            datetime.UTC
+        ) - datetime.timedelta(seconds=age)
+        self.handles = []
+
+    def get_workflow_handle(
+        self, workflow_id: str, *, result_type: type | None = None
+    ) -> _FakeHandle:
+        handle = _FakeHandle(
+            self.status, self.close_time, result_type, workflow_id
+        )
+        self.handles.append(handle)
+        return handle
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    ("status", "age", "reused"),
+    [
+        (client.WorkflowExecutionStatus.RUNNING, 0, True),
+        (client.WorkflowExecutionStatus.COMPLETED, 10, True),
+        (client.WorkflowExecutionStatus.COMPLETED, 100, False),
+        (client.WorkflowExecutionStatus.FAILED, 10, False),
+    ],
+)
+async def test_get_reusable_result(
+    status: client.WorkflowExecutionStatus, age: float, *, reused: bool
+) -> None:
+    temporal_client = _FakeClient(status, age)
+    result = await workflows.get_reusable_result(
+        temporal_client, "wf", max_age=60, result_type=str
+    )
+    assert result == ("wf" if reused else None)
+    assert [h.result_type for h in temporal_client.handles] == [str]
+
+
+@pytest.mark.asyncio
+async def test_reuse_completed(env: testing.WorkflowEnvironment) -> None:
+    async with worker.run_workers(env.client, aoc=FakeAocd()):
+        ref = await env.client.execute_workflow(
+            workflows.Prefetch.run,
+            workflows.PrefetchInput("token", 1),
+            id="prefetch-reuse",
+            task_queue=common.TASK_QUEUE_NAME,
+        )
+    assert (
+        await workflows.get_reusable_result(
+            env.client, "prefetch-reuse", result_type=str
+        )
+        == ref
+    )
+
+
+@pytest.mark.asyncio
+async def test_attach_running(env: testing.WorkflowEnvironment) -> None:
+    async with worker.run_workers(env.client, aoc=FakeAocd(delay=1)):
+        handle = await env.client.start_workflow(
+            workflows.Prefetch.run,
+            workflows.PrefetchInput("token", 1),
+            id="prefetch-attach",
+            task_queue=common.TASK_QUEUE_NAME,
+        )
+        attached = testing.ActivityEnvironment(client=env.client).run(
+            workflows.attach_workflow,
+            workflows._AttachInput("prefetch-attach"),  # noqa: SLF001
+        )
+        ref, attached_ref = await asyncio.gather(handle.result(), attached)
+    assert attached_ref == ref
+    assert common.get_blob(ref) == "input for day 1"
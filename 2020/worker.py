@@ -1,60 +1,391 @@
 #!/usr/bin/env python
 
 import asyncio
+import concurrent.futures
+import contextlib
 import importlib
 import logging
+import multiprocessing
+import os
+import time
+from collections.abc import AsyncIterator, Callable, Sequence
+from typing import Any
 
+import click
 from loguru import logger
-from temporalio import client, worker
+from temporalio import client, testing, worker
+from temporalio.worker import workflow_sandbox as sandbox
 
+import codec
 import common
+import connection
+import manifest
+import metrics
 import workflows
 
+# Threads for the blocking AOC API activities, which is also how many
+# of them an I/O worker runs at once
+DEFAULT_IO_THREADS = 8
+
+# Modules that are deterministic and safe to share between workflow
+# runs. They're imported once per worker instead of being re-imported
+# in the sandbox for every workflow run.
+SANDBOX_PASSTHROUGH_MODULES = ("common", "solutions.ksum")
 
-async def main() -> None:
-    logging.basicConfig(level=logging.INFO)
 
-    all_workflows = [
+def get_workflows(*, trusted_solutions: bool = False) -> list[type]:
+    # Solution classes are run by RunSolution, which imports each day's
+    # module when it's needed rather than at startup
+    return [
         workflows.SolvePart,
         workflows.Solve,
-        workflows.RunExamples,
+        workflows.SolveMany,
+        workflows.Prefetch,
+        (
+            workflows.RunTrustedSolution
+            if trusted_solutions
+            else workflows.RunSolution
+        ),
     ]
+
+
+def get_workflow_runner(
+    passthrough_modules: Sequence[str] = SANDBOX_PASSTHROUGH_MODULES,
+) -> worker.WorkflowRunner:
+    restrictions = sandbox.SandboxRestrictions.default
+    return sandbox.SandboxedWorkflowRunner(
+        restrictions=restrictions.with_passthrough_modules(
+            *passthrough_modules
+        )
+    )
+
+
+def get_io_activities(aoc: Any = None) -> list[Callable]:
+    solve = workflows.Solve(aoc)
+    return [
+        solve.fetch_input_data,
+        solve.set_answer,
+        solve.fetch_examples,
+    ]
+
+
+def get_compute_activities(aoc: Any = None) -> list[Callable]:
+    solve = workflows.Solve(aoc)
     all_activities = [
-        workflows.Solve().fetch_input_data,
-        workflows.Solve().set_answer,
-        workflows.RunExamples().fetch_examples,
+        # AOC API activities that workflows can run locally
+        solve.fetch_input_data_locally,
+        solve.fetch_examples_locally,
+        solve.set_answer_locally,
+        workflows.SolvePart().lookup_answer,
+        workflows.SolvePart().store_answer,
+        workflows.SolvePart().record_variant,
     ]
+    if manifest.has_functions():
+        all_activities.extend(
+            [workflows.solve_function, workflows.check_function_examples]
+        )
+    return all_activities
+
+
+# Every option is keyword-only and maps to a worker.py flag; callers
+# pass them through as **kwargs, e.g., from run_workers()
+def create_workers(  # noqa: PLR0913
+    temporal_client: client.Client,
+    *,
+    compute: bool = True,
+    io: bool = True,
+    max_concurrent_workflow_tasks: int | None = None,
+    max_concurrent_activities: int | None = None,
+    solver_processes: int | None = None,
+    io_threads: int = DEFAULT_IO_THREADS,
+    interceptors: Sequence[worker.Interceptor] = (),
+    passthrough_modules: Sequence[str] = SANDBOX_PASSTHROUGH_MODULES,
+    trusted_solutions: bool = False,
+    aoc: Any = None,
+) -> list[worker.Worker]:
+    """Create workers for the compute and/or I/O task queues.
+
+    The compute worker runs all workflows and solution functions; the
+    I/O worker runs the activities that call the AOC API, so slow
+    network calls and CPU-heavy solving don't starve each other. The
+    AOC API calls block, so they run on a pool of io_threads threads.
+    Along with the I/O worker, an attach worker runs attach_workflow,
+    which can wait for hours on a Solve; it has its own task queue so
+    that it can't use up the slots that Solve's activities need.
 
-    for day in range(1, 26):
-        try:
-            mod = importlib.import_module(f"solutions.day{day:02}")
-        except ImportError:
-            logger.info("No module found for day {}", day)
-        else:
-            for part in workflows.Part:
-                if wf := getattr(mod, part.value.class_name, None):
-                    logger.debug(
-                        "Discovered workflow {}.{}",
-                        mod.__name__,
-                        part.value.class_name,
+    passthrough_modules are shared with the workflow sandbox rather
+    than re-imported for each workflow run. If trusted_solutions is
+    set, solution classes run outside the sandbox entirely, and the
+    solutions package is passed through, so the examples SolvePart
+    checks inline don't re-import it either. aoc replaces aocd in the
+    I/O activities, e.g., with a fake for tests.
+    """
+    if trusted_solutions:
+        passthrough_modules = (*passthrough_modules, "solutions")
+    workers = []
+    if compute:
+        all_workflows = get_workflows(trusted_solutions=trusted_solutions)
+        all_activities = get_compute_activities(aoc)
+        logger.info("Loading compute worker with:")
+        logger.info("  Workflows: {}", all_workflows)
+        logger.info("  Activities: {}", all_activities)
+        extra_args = {}
+        if workflows.solve_function in all_activities:
+            # Solution functions are CPU-bound, so run them in separate
+            # processes to use all cores
+            extra_args = {
+                "activity_executor": concurrent.futures.ProcessPoolExecutor(
+                    solver_processes
+                ),
+                "shared_state_manager": (
+                    worker.SharedStateManager.create_from_multiprocessing(
+                        multiprocessing.Manager()
                     )
-                    all_workflows.append(wf)
+                ),
+            }
+        workers.append(
+            worker.Worker(
+                temporal_client,
+                task_queue=common.TASK_QUEUE_NAME,
+                workflows=all_workflows,
+                activities=all_activities,
+                max_concurrent_workflow_tasks=max_concurrent_workflow_tasks,
+                max_concurrent_activities=max_concurrent_activities,
+                interceptors=interceptors,
+                workflow_runner=get_workflow_runner(passthrough_modules),
+                **extra_args,
+            )
+        )
+    if io:
+        io_activities = get_io_activities(aoc)
+        logger.info("Loading I/O worker with:")
+        logger.info("  Activities: {}", io_activities)
+        workers.append(
+            worker.Worker(
+                temporal_client,
+                task_queue=common.IO_TASK_QUEUE_NAME,
+                activities=io_activities,
+                activity_executor=concurrent.futures.ThreadPoolExecutor(
+                    io_threads
+                ),
+                max_concurrent_activities=(
+                    max_concurrent_activities or io_threads
+                ),
+                interceptors=interceptors,
+            )
+        )
+        workers.append(
+            worker.Worker(
+                temporal_client,
+                task_queue=common.ATTACH_TASK_QUEUE_NAME,
+                activities=[workflows.attach_workflow],
+                interceptors=interceptors,
+            )
+        )
+    return workers
+
+
+@contextlib.asynccontextmanager
+async def run_workers(
+    temporal_client: client.Client, **kwargs: Any
+) -> AsyncIterator[None]:
+    """Run workers from create_workers() for the duration of the context."""
+    async with contextlib.AsyncExitStack() as stack:
+        for temporal_worker in create_workers(temporal_client, **kwargs):
+            await stack.enter_async_context(temporal_worker)
+        yield
+
+
+@contextlib.asynccontextmanager
+async def local_worker(
+    *, compress: bool = False, **kwargs: Any
+) -> AsyncIterator[client.Client]:
+    """Run an embedded Temporal dev server with in-process workers.
 
-    temporal_client = await client.Client.connect(
-        "localhost:7233",
-        namespace="default",
+    Yields a client connected to the embedded server. kwargs are
+    passed to create_workers(). The dev server binary is downloaded
+    the first time this is used.
+    """
+    async with (
+        await testing.WorkflowEnvironment.start_local(
+            data_converter=codec.get_data_converter(compress=compress)
+        ) as env,
+        run_workers(env.client, **kwargs),
+    ):
+        yield env.client
+
+
+async def _main(
+    *, compress: bool = False, metrics_port: int | None = None, **kwargs: Any
+) -> None:
+    logging.basicConfig(level=logging.INFO)
+
+    runtime = None
+    if metrics_port is not None:
+        runtime = metrics.create_runtime(metrics_port)
+        kwargs["interceptors"] = [
+            metrics.TimingInterceptor(runtime.metric_meter)
+        ]
+        logger.info(
+            "Serving metrics at http://127.0.0.1:{}/metrics", metrics_port
+        )
+    temporal_client = await connection.connect(
+        compress=compress, runtime=runtime
     )
-    logger.info("Loading worker with:")
-    logger.info("  Workflows: {}", all_workflows)
-    logger.info("  Activities: {}", all_activities)
-    temporal_worker = worker.Worker(
-        temporal_client,
-        task_queue=common.TASK_QUEUE_NAME,
-        workflows=all_workflows,
-        activities=all_activities,
+    await asyncio.gather(
+        *(w.run() for w in create_workers(temporal_client, **kwargs))
     )
-    await temporal_worker.run()
+
+
+def _measure_startup() -> None:
+    """Report how long registration takes with and without the manifest.
+
+    Workers only load the manifest at startup; the per-module import
+    times are what each workflow pays the first time it runs that day,
+    and what startup would cost if solutions were imported eagerly.
+    """
+    start = time.perf_counter()
+    days = manifest.days()
+    manifest_time = time.perf_counter() - start
+    click.echo(f"{'module':<20} {'import ms':>10}")
+    click.echo(f"{'(manifest)':<20} {manifest_time * 1000:>10.2f}")
+    total = 0.0
+    for day in days:
+        name = common.get_module_name(day)
+        start = time.perf_counter()
+        importlib.import_module(name)
+        elapsed = time.perf_counter() - start
+        total += elapsed
+        click.echo(f"{name:<20} {elapsed * 1000:>10.2f}")
+    click.echo(f"{'(all modules)':<20} {total * 1000:>10.2f}")
+
+
+def _run_process(**kwargs: Any) -> None:
+    asyncio.run(_main(**kwargs))
+
+
+@click.command()
+@click.option(
+    "--compress",
+    envvar="AOC_COMPRESS",
+    help="Compress large payloads (must match the client setting)",
+    is_flag=True,
+    default=False,
+)
+@click.option(
+    "-n",
+    "--processes",
+    help="Number of worker processes to start",
+    type=int,
+    default=1,
+)
+@click.option(
+    "--io-processes",
+    help=(
+        "Number of dedicated processes for AOC API activities. If 0, "
+        "every worker process also serves the I/O task queue."
+    ),
+    type=int,
+    default=0,
+)
+@click.option(
+    "--io-threads",
+    help="Number of threads per worker for blocking AOC API calls",
+    type=int,
+    default=DEFAULT_IO_THREADS,
+)
+@click.option(
+    "--max-concurrent-workflow-tasks",
+    help="Maximum concurrent workflow tasks per worker",
+    type=int,
+)
+@click.option(
+    "--max-concurrent-activities",
+    help="Maximum concurrent activities per worker",
+    type=int,
+)
+@click.option(
+    "--metrics-port",
+    help=(
+        "Serve Prometheus metrics on this port. With multiple processes, "
+        "each process uses the next port up."
+    ),
+    type=int,
+)
+@click.option(
+    "--passthrough",
+    help=(
+        "Extra module to share with the workflow sandbox instead of "
+        "re-importing it for every workflow run (may be given more than "
+        "once)"
+    ),
+    multiple=True,
+)
+@click.option(
+    "--trusted-solutions",
+    help="Run solution workflows outside the workflow sandbox",
+    is_flag=True,
+    default=False,
+)
+@click.option(
+    "--measure-startup",
+    help="Report solution registration and import times, then exit",
+    is_flag=True,
+    default=False,
+)
+def main(  # noqa: PLR0913
+    *,
+    compress: bool,
+    processes: int,
+    io_processes: int,
+    io_threads: int,
+    max_concurrent_workflow_tasks: int | None,
+    max_concurrent_activities: int | None,
+    metrics_port: int | None,
+    passthrough: tuple[str, ...],
+    trusted_solutions: bool,
+    measure_startup: bool,
+) -> None:
+    if measure_startup:
+        _measure_startup()
+        return
+
+    common_args = {
+        "compress": compress,
+        "max_concurrent_workflow_tasks": max_concurrent_workflow_tasks,
+        "max_concurrent_activities": max_concurrent_activities,
+        "io_threads": io_threads,
+        "passthrough_modules": SANDBOX_PASSTHROUGH_MODULES + passthrough,
+        "trusted_solutions": trusted_solutions,
+        # Share the cores between the worker processes' solver pools
+        "solver_processes": max(1, (os.cpu_count() or 1) // processes),
+    }
+    if io_processes:
+        process_args = [{"io": False}] * processes + [
+            {"compute": False}
+        ] * io_processes
+    else:
+        process_args = [{}] * processes
+
+    if metrics_port is not None:
+        for i, args in enumerate(process_args):
+            process_args[i] = {**args, "metrics_port": metrics_port + i}
+
+    if len(process_args) == 1:
+        _run_process(**common_args, **process_args[0])
+        return
+
+    worker_processes = [
+        multiprocessing.Process(
+            target=_run_process, kwargs={**common_args, **args}
+        )
+        for args in process_args
+    ]
+    for proc in worker_processes:
+        proc.start()
+    for proc in worker_processes:
+        proc.join()
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    main()
@@ -1,14 +1,30 @@
+import ast
+import asyncio
+import contextlib
+import contextvars
 import dataclasses
 import datetime
 import enum
+import hashlib
 import importlib
+import importlib.util
+import inspect
 import json
+import os
+import pathlib
+import tempfile
+import threading
+import time
+from collections.abc import Awaitable, Callable, Sequence
 from typing import Any
 
+import temporalio.client
 import temporalio.common
-from temporalio import activity, workflow
+import temporalio.service
+from temporalio import activity, exceptions, workflow
 
 import common
+import ledger
 
 with workflow.unsafe.imports_passed_through():
     import aocd
@@ -28,9 +44,10 @@ def _get_task_id(obj: Any, **attrs: Any) -> str:
 class _PartDescriptor:
     name: str
     class_name: str
+    func_name: str
     answer_name: str
 
-    def get_answer(self, example: aocd.examples.Example) -> str:
+    def get_answer(self, example: "Example") -> str | None:
         return getattr(example, f"answer_{self.answer_name}")
 
     @property
@@ -42,42 +59,499 @@ class _PartDescriptor:
 
 
 class Part(enum.Enum):
-    ONE = _PartDescriptor("part 1", "Part1", "a")
-    TWO = _PartDescriptor("part 2", "Part2", "b")
+    ONE = _PartDescriptor("part 1", "Part1", "part1", "a")
+    TWO = _PartDescriptor("part 2", "Part2", "part2", "b")
 
     def __str__(self) -> str:
         return str(self.value)
 
 
-def _get_workflow_class(part: _PartDescriptor, day: int) -> type:
-    mod = importlib.import_module(f"solutions.day{day:02}")
-    try:
-        return getattr(mod, part.class_name)
-    except AttributeError:
-        workflow.logger.warning(
-            "No solution workflow defined for day %s %s", day, part
+def _get_variants(part: _PartDescriptor, day: int) -> dict[str, str]:
+    """Get the names of the solutions for a part, keyed by variant name.
+
+    A day module can define each part either as a workflow class (e.g.,
+    Part1) or as a plain function (e.g., part1) that takes the input
+    data and any extra example arguments. Workflow classes are
+    preferred if both exist. The unsuffixed solution is the variant
+    named "".
+
+    Alternative implementations are opted in with a module-level
+    VARIANTS dict, keyed by solution name, that maps each variant name
+    to the name it's defined under in the module, e.g.:
+
+        VARIANTS = {"part2": {"sets": "part2_sets", "fast": "_part2"}}
+    """
+    mod = importlib.import_module(common.get_module_name(day))
+    declared = getattr(mod, "VARIANTS", {})
+    variants = {}
+    for name in (part.func_name, part.class_name):
+        if hasattr(mod, name):
+            variants[""] = name
+        variants.update(declared.get(name, {}))
+    if not variants:
+        workflow.logger.warning("No solution defined for day %s %s", day, part)
+        raise AttributeError(part.class_name)
+    return variants
+
+
+def _get_solution(day: int, name: str) -> type | Callable:
+    """Get a solution by the name it's defined under in its module."""
+    return getattr(importlib.import_module(common.get_module_name(day)), name)
+
+
+class _FetchCache:
+    """On-disk cache of data fetched from the AOC API.
+
+    Entries are keyed by year, day, and a hash of the session token,
+    so different users never share cached data. Entries expire after
+    ttl, and the least recently used entries are evicted when there
+    are more than max_entries. Values must be JSON-serializable.
+    """
+
+    def __init__(
+        self, name: str, *, ttl: datetime.timedelta, max_entries: int = 64
+    ) -> None:
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        # Fetch activities run on a thread pool, so counters are shared
+        self._lock = threading.Lock()
+
+    def _path(self, day: int, session_token: str) -> pathlib.Path:
+        return (
+            common.CACHE_DIR
+            / "fetch"
+            / self.name
+            / f"{common.YEAR}-{day:02}-{common.token_hash(session_token)}.json"
         )
-        raise
 
+    def _read(self, path: pathlib.Path) -> Any | None:
+        try:
+            entry = json.loads(path.read_text())
+        except (OSError, ValueError):
+            return None
+        if time.time() - entry["fetched"] > self.ttl.total_seconds():
+            return None
+        # Bump mtime, which is what eviction uses to find LRU entries.
+        # Another thread may have just evicted it, which is fine: the
+        # value has already been read.
+        with contextlib.suppress(FileNotFoundError):
+            os.utime(path)
+        return entry["value"]
+
+    def _write(self, path: pathlib.Path, value: Any) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            "w",
+            dir=path.parent,
+            prefix=f"{path.name}.",
+            suffix=".tmp",
+            delete=False,
+        ) as tmp:
+            json.dump({"fetched": time.time(), "value": value}, tmp)
+        pathlib.Path(tmp.name).replace(path)
+
+        # Other threads may be evicting at the same time, so entries can
+        # disappear between listing and stat()ing them
+        entries = []
+        for entry_path in path.parent.glob("*.json"):
+            try:
+                entries.append((entry_path.stat().st_mtime, entry_path))
+            except FileNotFoundError:
+                continue
+        entries.sort()
+        for _, old_path in entries[: -self.max_entries]:
+            old_path.unlink(missing_ok=True)
+
+    def get(
+        self, day: int, session_token: str, fetch: Callable[[], Any]
+    ) -> Any:
+        """Get a cached value, calling fetch() to populate it on a miss."""
+        path = self._path(day, session_token)
+        value = self._read(path)
+        if value is None:
+            value = fetch()
+            self._write(path, value)
+            result = "miss"
+        else:
+            result = "hit"
+        with self._lock:
+            if result == "hit":
+                self.hits += 1
+            else:
+                self.misses += 1
+            hits, misses = self.hits, self.misses
+        activity.logger.info(
+            "%s cache %s for day %s (%s hits, %s misses)",
+            self.name,
+            result,
+            day,
+            hits,
+            misses,
+        )
+        return value
+
+
+# Puzzle input never changes, but examples gain part 2 answers once
+# part 2 is unlocked
+_INPUT_CACHE = _FetchCache("input", ttl=datetime.timedelta(days=30))
+_EXAMPLES_CACHE = _FetchCache("examples", ttl=datetime.timedelta(hours=1))
 
-_AOC_API_ACTIVITY_TIMEOUT = datetime.timedelta(5)
+
+# aocd may wait out AOC's rate limit before submitting, so allow some
+# time for that
+_AOC_API_ACTIVITY_TIMEOUT = datetime.timedelta(minutes=2)
 _AOC_API_RETRY = temporalio.common.RetryPolicy(maximum_attempts=2)
 
 
-async def execute_aoc_activity(method: callable, *args: Any) -> Any:
-    return workflow.execute_activity_method(
+# Attempts at a local AOC API activity before falling back to a
+# regular activity on the I/O task queue
+_LOCAL_AOC_API_ATTEMPTS = 2
+
+
+async def execute_aoc_activity(
+    method: callable, *args: Any, local_method: Callable | None = None
+) -> Any:
+    """Run an AOC API activity.
+
+    If local_method is given, it's run as a local activity first, which
+    skips the round trips through the server and the I/O task queue.
+    If that fails _LOCAL_AOC_API_ATTEMPTS times, method is run as a
+    regular activity instead.
+    """
+    if local_method is not None:
+        try:
+            return await workflow.execute_local_activity_method(
+                local_method,
+                *args,
+                retry_policy=temporalio.common.RetryPolicy(
+                    maximum_attempts=_LOCAL_AOC_API_ATTEMPTS
+                ),
+                start_to_close_timeout=_AOC_API_ACTIVITY_TIMEOUT,
+            )
+        except exceptions.ActivityError as err:
+            workflow.logger.warning(
+                "Local activity %s failed, falling back to a regular "
+                "activity: %s",
+                local_method.__name__,
+                err.cause,
+            )
+    return await workflow.execute_activity_method(
         method,
         *args,
+        task_queue=common.IO_TASK_QUEUE_NAME,
         retry_policy=_AOC_API_RETRY,
         start_to_close_timeout=_AOC_API_ACTIVITY_TIMEOUT,
     )
 
 
+_SOLVE_FUNCTION_TIMEOUT = datetime.timedelta(hours=12)
+_SOLVE_FUNCTION_HEARTBEAT_TIMEOUT = datetime.timedelta(seconds=10)
+_SOLVE_FUNCTION_HEARTBEAT_INTERVAL = datetime.timedelta(seconds=2)
+# Solution errors are non-retryable (see solve_function), so this only
+# retries when a worker stops heartbeating, e.g., because it restarted
+_SOLVE_FUNCTION_RETRY = temporalio.common.RetryPolicy(maximum_attempts=5)
+
+
+@dataclasses.dataclass
+class SolveFunctionInput:
+    day: int
+    part: _PartDescriptor
+    data: common.PartInput
+    func_name: str
+
+
+def _call_function(
+    func: Callable, data: common.PartInput, progress: common.Progress
+) -> str:
+    kwargs = dict(data.extra or {})
+    if "progress" in inspect.signature(func).parameters:
+        kwargs["progress"] = progress
+    return str(func(data.get_input_data(), **kwargs))
+
+
+@activity.defn
+def solve_function(data: SolveFunctionInput) -> str:
+    """Run a solution defined as a plain function.
+
+    This is a sync activity, so the worker runs it in its process pool
+    rather than on the workflow task thread.
+
+    While the function runs, a background thread heartbeats with the
+    function's latest checkpoint, if any. Functions that accept a
+    progress argument get a common.Progress, whose checkpoint is
+    restored from the last heartbeat if the activity is retried.
+    """
+    func = _get_solution(data.day, data.func_name)
+    progress = common.Progress(*activity.info().heartbeat_details[:1])
+    if progress.checkpoint is not None:
+        activity.logger.info(
+            "Resuming day %s %s from checkpoint %r",
+            data.day,
+            data.part,
+            progress.checkpoint,
+        )
+
+    stop = threading.Event()
+
+    def heartbeat() -> None:
+        interval = _SOLVE_FUNCTION_HEARTBEAT_INTERVAL.total_seconds()
+        while not stop.wait(interval):
+            activity.heartbeat(progress.checkpoint)
+
+    heartbeater = threading.Thread(
+        target=contextvars.copy_context().run, args=(heartbeat,), daemon=True
+    )
+    heartbeater.start()
+    try:
+        return _call_function(func, data.data, progress)
+    except Exception as err:
+        # Solutions are deterministic, so retrying one that raised an
+        # error would just raise it again
+        msg = f"{type(err).__name__}: {err}"
+        raise exceptions.ApplicationError(msg, non_retryable=True) from err
+    finally:
+        stop.set()
+
+
+def execute_solution(
+    name: str,
+    day: int,
+    part: _PartDescriptor,
+    data: common.PartInput,
+    *,
+    task_id: str,
+) -> Awaitable[str]:
+    """Run a solution named by _get_variants().
+
+    Workflow classes are run as child workflows, and functions as
+    solve_function activities.
+    """
+    if isinstance(_get_solution(day, name), type):
+        return workflow.execute_child_workflow(
+            get_solution_workflow_type(day, name),
+            data,
+            result_type=str,
+            id=task_id,
+            task_queue=common.TASK_QUEUE_NAME,
+        )
+    return workflow.execute_activity(
+        solve_function,
+        SolveFunctionInput(day, part, data, name),
+        activity_id=task_id,
+        task_queue=common.TASK_QUEUE_NAME,
+        start_to_close_timeout=_SOLVE_FUNCTION_TIMEOUT,
+        heartbeat_timeout=_SOLVE_FUNCTION_HEARTBEAT_TIMEOUT,
+        retry_policy=_SOLVE_FUNCTION_RETRY,
+    )
+
+
+def get_solution_workflow_type(day: int, name: str) -> str:
+    """Get the workflow type that runs a solution class.
+
+    Every day names its classes Part1 and Part2, so the type is
+    qualified with the day's module name, e.g., "day01.Part1". The
+    class is named by its attribute in the module rather than its
+    __name__, so variants can be aliases.
+    """
+    return f"day{day:02}.{name}"
+
+
+async def _run_solution(args: Sequence[temporalio.common.RawValue]) -> str:
+    module_name, _, class_name = workflow.info().workflow_type.partition(".")
+    solution = _get_solution(int(module_name.removeprefix("day")), class_name)
+    data = workflow.payload_converter().from_payload(
+        args[0].payload, common.PartInput
+    )
+    return await solution().run(data)
+
+
+@workflow.defn(dynamic=True)
+class RunSolution:
+    """Run a solution class by its get_solution_workflow_type() name.
+
+    Registering this instead of the solution classes themselves means
+    workers don't have to import every day's module at startup; each
+    module is imported when a workflow that needs it runs.
+    """
+
+    @workflow.run
+    async def run(self, args: Sequence[temporalio.common.RawValue]) -> str:
+        return await _run_solution(args)
+
+
+@workflow.defn(dynamic=True, sandboxed=False)
+class RunTrustedSolution:
+    """Run a solution class outside the workflow sandbox.
+
+    Workers register this in place of RunSolution when solutions are
+    trusted to be deterministic. Solution modules are then imported
+    once per worker, rather than once per workflow run.
+    """
+
+    @workflow.run
+    async def run(self, args: Sequence[temporalio.common.RawValue]) -> str:
+        return await _run_solution(args)
+
+
+async def get_reusable_result(
+    temporal_client: temporalio.client.Client,
+    workflow_id: str,
+    *,
+    max_age: float | None = None,
+    result_type: type | None = None,
+) -> Any | None:
+    """Get the result of an existing workflow execution, if any.
+
+    If the workflow is running, this waits for it to finish. If it
+    completed less than max_age seconds ago (or at any time, if
+    max_age is None), its result is returned. Otherwise, returns None.
+    """
+    handle = temporal_client.get_workflow_handle(
+        workflow_id, result_type=result_type
+    )
+    try:
+        desc = await handle.describe()
+    except temporalio.service.RPCError as err:
+        if err.status == temporalio.service.RPCStatusCode.NOT_FOUND:
+            return None
+        raise
+    status = temporalio.client.WorkflowExecutionStatus
+    if desc.status != status.RUNNING and (
+        desc.status != status.COMPLETED
+        or (
+            max_age is not None
+            and datetime.datetime.now(datetime.UTC) - desc.close_time
+            > datetime.timedelta(seconds=max_age)
+        )
+    ):
+        return None
+    return await handle.result()
+
+
+@dataclasses.dataclass
+class _AttachInput:
+    workflow_id: str
+    max_age: float | None = None
+
+
+_ATTACH_TIMEOUT = datetime.timedelta(hours=12)
+_ATTACH_HEARTBEAT_TIMEOUT = datetime.timedelta(seconds=30)
+_ATTACH_HEARTBEAT_INTERVAL = datetime.timedelta(seconds=10)
+_ATTACH_RETRY = temporalio.common.RetryPolicy(maximum_attempts=3)
+
+
+@activity.defn
+async def attach_workflow(data: _AttachInput) -> Any | None:
+    """Wait for an existing workflow execution with get_reusable_result().
+
+    Workflows can't wait for executions they didn't start, so this
+    does it from an activity.
+    """
+    result = asyncio.ensure_future(
+        get_reusable_result(
+            activity.client(), data.workflow_id, max_age=data.max_age
+        )
+    )
+    while not (
+        await asyncio.wait(
+            {result}, timeout=_ATTACH_HEARTBEAT_INTERVAL.total_seconds()
+        )
+    )[0]:
+        activity.heartbeat()
+    try:
+        return result.result()
+    except temporalio.client.WorkflowFailureError as err:
+        # Retrying would find the workflow closed and return None, so
+        # report the failure to the caller instead
+        msg = f"Workflow {data.workflow_id} failed: {err.cause}"
+        raise exceptions.ApplicationError(msg, non_retryable=True) from err
+
+
+async def execute_child_or_attach(
+    run: Callable,
+    arg: Any,
+    *,
+    workflow_id: str,
+    result_type: type,
+    reuse_window: float = 0,
+) -> Any:
+    """Run a child workflow, or reuse an existing one with the same ID.
+
+    If an execution with the ID completed within reuse_window seconds,
+    its result is reused. If one is running, whether started by
+    another workflow or a client, this waits for it instead of
+    failing to start a duplicate. If that execution doesn't complete,
+    this raises an ActivityError or ApplicationError.
+    """
+
+    async def attach(max_age: float | None) -> Any | None:
+        return await workflow.execute_activity(
+            attach_workflow,
+            _AttachInput(workflow_id, max_age),
+            result_type=result_type | None,
+            task_queue=common.ATTACH_TASK_QUEUE_NAME,
+            start_to_close_timeout=_ATTACH_TIMEOUT,
+            heartbeat_timeout=_ATTACH_HEARTBEAT_TIMEOUT,
+            retry_policy=_ATTACH_RETRY,
+        )
+
+    if reuse_window and (output := await attach(reuse_window)) is not None:
+        workflow.logger.info(
+            "Reusing result of existing workflow %s", workflow_id
+        )
+        return output
+    try:
+        handle = await workflow.start_child_workflow(
+            run, arg, id=workflow_id, task_queue=common.TASK_QUEUE_NAME
+        )
+    except exceptions.WorkflowAlreadyStartedError:
+        workflow.logger.info("Waiting for existing workflow %s", workflow_id)
+        # Whatever it was, it started after this workflow checked for
+        # reusable results, so its result is always fresh enough
+        output = await attach(None)
+        if output is None:
+            msg = f"Existing workflow {workflow_id} did not complete"
+            raise exceptions.ApplicationError(
+                msg, non_retryable=True
+            ) from None
+        return output
+    return await handle
+
+
+@dataclasses.dataclass
+class Example:
+    """AOC example class.
+
+    AOCD returns examples as NamedTuples, which get cast to lists when
+    JSONified. This provides a way to turn them into dataclasses,
+    which get turned into dicts.
+
+    Examples are fetched once per day, so this retains the answers to
+    both parts; use _PartDescriptor.get_answer() to get the answer for
+    a given part.
+    """
+
+    input_data: str
+    answer_a: str | None = None
+    answer_b: str | None = None
+    extra: dict[str, Any] | None = None
+
+
 @dataclasses.dataclass
 class SolveInput:
     day: int
     session_token: str
     fast: bool = False
+    concurrent: bool = False
+    fail_fast: bool = False
+    force: bool = False
+    # Makes the workflow IDs unique, so identical runs don't conflict
+    nonce: str | None = None
+    # Call the AOC API from local activities
+    local_activities: bool = False
 
     @property
     def task_id(self) -> str:
@@ -86,12 +560,17 @@ class SolveInput:
             day=self.day,
             fast=self.fast,
             tok=self.session_token[0:6],
+            **({"nonce": self.nonce} if self.nonce else {}),
         )
 
 
 @dataclasses.dataclass
 class SolveOutput:
     answers: list[tuple[_PartDescriptor, str | None]]
+    # Answers sent to AOC, and answers skipped because the submission
+    # ledger already had a verdict for them
+    submitted: int = 0
+    skipped: int = 0
 
 
 @dataclasses.dataclass
@@ -103,53 +582,200 @@ class _SetAnswerInput:
 
 @workflow.defn
 class Solve:
+    def __init__(self, aoc: Any = None) -> None:
+        # Anything with aocd's get_data(), get_puzzle(), submit(), and
+        # models API can stand in for aocd, e.g., a fake in tests
+        self._aoc = aoc or aocd
+
     @workflow.run
     async def run(self, data: SolveInput) -> SolveOutput:
-        input_data = await execute_aoc_activity(self.fetch_input_data, data)
-
-        answers = {}
-        for part in Part:
-            part_input = SolvePartInput(
+        # Fetch the input and examples at the same time, since neither
+        # depends on the other
+        input_ref, examples = await asyncio.gather(
+            execute_aoc_activity(
+                self.fetch_input_data,
                 data,
-                part.value,
-                input_data,
-            )
-            answers[part.value] = await workflow.execute_child_workflow(
-                SolvePart,
-                part_input,
-                task_queue=common.TASK_QUEUE_NAME,
-                id=part_input.task_id,
-            )
+                local_method=self._local(data, self.fetch_input_data_locally),
+            ),
+            self._get_examples(data),
+        )
 
-            if answers[part.value] is not None:
-                await execute_aoc_activity(
-                    self.set_answer,
-                    _SetAnswerInput(data, part.value, answers[part.value]),
-                )
-        return SolveOutput(list(answers.items()))
+        solvers = [
+            self._solve_part(data, part.value, input_ref, examples)
+            for part in Part
+        ]
+        if data.concurrent:
+            results = await asyncio.gather(*solvers)
+        else:
+            results = [await solver for solver in solvers]
+        answers = [answer for answer, _ in results]
+        submitted = [sent for _, sent in results if sent is not None]
+        return SolveOutput(
+            list(zip((part.value for part in Part), answers, strict=True)),
+            submitted=submitted.count(True),
+            skipped=submitted.count(False),
+        )
+
+    async def _get_examples(self, data: SolveInput) -> list[Example]:
+        if data.fast:
+            return []
+        return await execute_aoc_activity(
+            self.fetch_examples,
+            data,
+            local_method=self._local(data, self.fetch_examples_locally),
+        )
+
+    def _local(self, data: SolveInput, method: Callable) -> Callable | None:
+        return method if data.local_activities else None
+
+    async def _solve_part(
+        self,
+        data: SolveInput,
+        part: _PartDescriptor,
+        input_ref: str,
+        examples: list[Example],
+    ) -> tuple[str | None, bool | None]:
+        """Solve a part and submit the answer.
+
+        Returns the answer, and whether it was sent to AOC (or None if
+        there was no answer to submit).
+        """
+        part_input = SolvePartInput(data, part, input_ref, examples)
+        answer = await workflow.execute_child_workflow(
+            SolvePart,
+            part_input,
+            task_queue=common.TASK_QUEUE_NAME,
+            id=part_input.task_id,
+        )
+
+        if answer is None:
+            return None, None
+        submitted = await execute_aoc_activity(
+            self.set_answer,
+            _SetAnswerInput(data, part, answer),
+            local_method=self._local(data, self.set_answer_locally),
+        )
+        return answer, submitted
+
+    # aocd blocks, so the AOC API activities are sync. The I/O worker
+    # runs them in a thread pool so they don't stall its event loop.
+
+    @activity.defn
+    def fetch_input_data(self, data: SolveInput) -> str:
+        """Fetch the puzzle input and return its blob store reference."""
+        return common.put_blob(
+            _INPUT_CACHE.get(
+                data.day,
+                data.session_token,
+                lambda: self._aoc.get_data(
+                    session=data.session_token, day=data.day, year=common.YEAR
+                ),
+            )
+        )
 
     @activity.defn
-    async def fetch_input_data(self, data: SolveInput) -> str:
-        return aocd.get_data(
-            session=data.session_token, day=data.day, year=common.YEAR
+    def fetch_examples(self, data: SolveInput) -> list[Example]:
+        examples = _EXAMPLES_CACHE.get(
+            data.day,
+            data.session_token,
+            lambda: [
+                ex._asdict()
+                for ex in self._aoc.get_puzzle(
+                    session=data.session_token,
+                    day=data.day,
+                    year=common.YEAR,
+                ).examples
+            ],
         )
+        retval = [Example(**ex) for ex in examples]
+        activity.logger.info("Fetched %s examples: %s", len(retval), retval)
+        return retval
 
     @activity.defn
-    async def set_answer(self, data: _SetAnswerInput) -> None:
-        aocd.submit(
+    def set_answer(self, data: _SetAnswerInput) -> bool:
+        """Submit an answer, unless its verdict is already known.
+
+        Returns True if the answer was sent to AOC.
+        """
+        args = (
+            data.problem.session_token,
+            data.problem.day,
+            data.part.answer_name,
+            data.answer,
+        )
+        if verdict := ledger.lookup(*args):
+            activity.logger.info(
+                "Not submitting %r for day %s %s, already known to be %s",
+                data.answer,
+                data.problem.day,
+                data.part,
+                verdict,
+            )
+            return False
+
+        self._aoc.submit(
             answer=data.answer,
             part=data.part.answer_name,
             day=data.problem.day,
             year=common.YEAR,
             session=data.problem.session_token,
         )
+        puzzle = self._aoc.models.Puzzle(
+            year=common.YEAR,
+            day=data.problem.day,
+            user=self._aoc.models.User(token=data.problem.session_token),
+        )
+        if verdict := _get_verdict(puzzle, data.part, data.answer):
+            ledger.record(*args, verdict)
+        return True
+
+    # Local activities run on the compute worker, which has no thread
+    # pool for sync activities, so these run the blocking calls in
+    # threads themselves
+
+    @activity.defn
+    async def fetch_input_data_locally(self, data: SolveInput) -> str:
+        return await asyncio.to_thread(self.fetch_input_data, data)
+
+    @activity.defn
+    async def fetch_examples_locally(self, data: SolveInput) -> list[Example]:
+        return await asyncio.to_thread(self.fetch_examples, data)
+
+    @activity.defn
+    async def set_answer_locally(self, data: _SetAnswerInput) -> bool:
+        return await asyncio.to_thread(self.set_answer, data)
+
+
+def _get_verdict(
+    puzzle: aocd.models.Puzzle, part: _PartDescriptor, answer: str
+) -> str | None:
+    """Get the verdict on an answer from aocd's local submission record.
+
+    Returns None if the verdict isn't known, e.g., because AOC
+    rate-limited the submission.
+    """
+    for result in reversed(puzzle.submit_results):
+        if result["part"] != part.answer_name:
+            continue
+        if result["message"].startswith("That's the right answer"):
+            return (
+                ledger.CORRECT
+                if result["value"] == answer
+                else ledger.INCORRECT
+            )
+        if result["value"] == answer and result["message"].startswith(
+            "That's not the right answer"
+        ):
+            return ledger.INCORRECT
+    return None
 
 
 @dataclasses.dataclass
 class SolvePartInput:
     problem: SolveInput
     part: _PartDescriptor
-    input_data: str
+    input_ref: str
+    examples: list[Example] = dataclasses.field(default_factory=list)
 
     @property
     def task_id(self) -> str:
@@ -160,119 +786,565 @@ class SolvePartInput:
         )
 
 
+# Which variant won each race, for comparing variants over time
+VARIANTS_PATH = common.CACHE_DIR / "variants.jsonl"
+
+
+@dataclasses.dataclass
+class _VariantResult:
+    day: int
+    part: str
+    input_ref: str
+    winner: str
+    seconds: float
+    failed: list[str]
+
+
+@dataclasses.dataclass
+class _MemoKey:
+    day: int
+    part: _PartDescriptor
+    input_ref: str
+    # Answers from fast runs haven't been checked against the examples,
+    # so they're only reused by other fast runs
+    fast: bool = False
+
+
+def _imported_solutions(source: bytes) -> list[str]:
+    """Get the solutions.* modules that a module's source imports."""
+    names = []
+    for node in ast.walk(ast.parse(source)):
+        if isinstance(node, ast.Import):
+            names.extend(
+                alias.name
+                for alias in node.names
+                if alias.name.startswith("solutions.")
+            )
+        elif isinstance(node, ast.ImportFrom):
+            module = node.module or ""
+            if node.level:
+                # Relative imports can only be from within solutions
+                module = f"solutions.{module}".rstrip(".")
+            if module == "solutions":
+                names.extend(f"solutions.{alias.name}" for alias in node.names)
+            elif module.startswith("solutions."):
+                names.append(module)
+    return names
+
+
+def _solution_source_hash(day: int) -> str:
+    """Hash the source of a day's module and the solutions it imports.
+
+    Imports are followed transitively, so a memoized answer is
+    invalidated by a change to any shared solutions module it uses,
+    e.g., solutions.ksum.
+    """
+    sources = {}
+    pending = [common.get_module_name(day)]
+    while pending:
+        name = pending.pop()
+        if name in sources:
+            continue
+        spec = importlib.util.find_spec(name)
+        if spec is None or spec.origin is None:
+            # Not a module, e.g., a name imported from solutions
+            continue
+        sources[name] = pathlib.Path(spec.origin).read_bytes()
+        pending.extend(_imported_solutions(sources[name]))
+    digest = hashlib.sha256()
+    for name in sorted(sources):
+        digest.update(f"{name}\0".encode())
+        digest.update(sources[name])
+    return digest.hexdigest()
+
+
+@dataclasses.dataclass
+class _Memo:
+    key: _MemoKey
+    source_hash: str
+    answer: str | None = None
+
+    @property
+    def path(self) -> pathlib.Path:
+        return (
+            common.CACHE_DIR
+            / "answers"
+            / f"{self.key.day:02}-{self.key.part.answer_name}"
+            / f"{self.key.input_ref}-{self.source_hash}"
+        )
+
+
+_MEMO_ACTIVITY_TIMEOUT = datetime.timedelta(seconds=10)
+
+
+def _perf_counter() -> float:
+    """Get time.perf_counter(), which the sandbox otherwise disallows.
+
+    This must only be used for measurements that never affect what a
+    workflow does.
+    """
+    with workflow.unsafe.sandbox_unrestricted():
+        return time.perf_counter()
+
+
 @workflow.defn
 class SolvePart:
+    def __init__(self) -> None:
+        self._examples_seconds = 0.0
+
+    @workflow.query
+    def examples_seconds(self) -> float:
+        """Get how long this run spent checking examples inline.
+
+        Examples for solution classes run inside this workflow rather
+        than in an activity or child workflow, so they leave nothing in
+        its history to time. This is measured on the worker instead;
+        querying a closed run replays it, which measures them again.
+        """
+        return self._examples_seconds
+
     @workflow.run
     async def run(self, data: SolvePartInput) -> str | None:
+        try:
+            variants = _get_variants(data.part, data.problem.day)
+        except AttributeError:
+            return None
+
+        memo = await workflow.execute_activity_method(
+            self.lookup_answer,
+            _MemoKey(
+                data.problem.day,
+                data.part,
+                data.input_ref,
+                fast=data.problem.fast,
+            ),
+            start_to_close_timeout=_MEMO_ACTIVITY_TIMEOUT,
+        )
+        if memo.answer is not None and not data.problem.force:
+            workflow.logger.info(
+                "Input and solution for day %s %s are unchanged, "
+                "reusing answer",
+                data.problem.day,
+                data.part,
+            )
+            return memo.answer
+
+        if len(variants) == 1:
+            memo.answer = await self._run_variant(data, *variants.popitem())
+        else:
+            memo.answer = await self._race(data, variants)
+        await workflow.execute_activity_method(
+            self.store_answer,
+            memo,
+            start_to_close_timeout=_MEMO_ACTIVITY_TIMEOUT,
+        )
+        return memo.answer
+
+    async def _run_variant(
+        self, data: SolvePartInput, variant: str, name: str
+    ) -> str:
         if not data.problem.fast:
-            ex_input = RunExamplesInput(data.problem, data.part)
-            await workflow.execute_child_workflow(
-                RunExamples,
-                ex_input,
-                id=ex_input.task_id,
-                retry_policy=common.NEVER_RETRY,
+            start = _perf_counter()
+            results = await check_examples(
+                name,
+                data.problem.day,
+                data.part,
+                data.examples,
+                fail_fast=data.problem.fail_fast,
             )
+            if isinstance(_get_solution(data.problem.day, name), type):
+                self._examples_seconds += _perf_counter() - start
+            _raise_for_failures(data.part, results)
+
+        return await execute_solution(
+            name,
+            data.problem.day,
+            data.part,
+            common.PartInput(input_ref=data.input_ref),
+            task_id=f"run-{variant}-{data.task_id}"
+            if variant
+            else f"run-{data.task_id}",
+        )
+
+    async def _race(
+        self, data: SolvePartInput, variants: dict[str, str]
+    ) -> str:
+        """Run all variants at once and return the first good answer.
 
+        The first variant to pass its examples and finish wins; the rest
+        are cancelled. The winner is recorded with record_variant().
+        """
+        start = workflow.now()
+        pending = {
+            asyncio.ensure_future(
+                self._run_variant(data, variant, name)
+            ): variant
+            for variant, name in variants.items()
+        }
+        failures = []
+        winner = None
         try:
-            cls = _get_workflow_class(data.part, data.problem.day)
-        except AttributeError:
-            return None
+            while pending and winner is None:
+                done, _ = await workflow.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                # Sort so that ties are broken in a deterministic order
+                for task in sorted(done, key=lambda t: pending[t]):
+                    variant = pending.pop(task)
+                    if task.exception() is not None:
+                        workflow.logger.warning(
+                            "Variant %r of day %s %s failed: %s",
+                            variant,
+                            data.problem.day,
+                            data.part,
+                            task.exception(),
+                        )
+                        failures.append(variant)
+                    elif winner is None:
+                        winner = variant, task.result()
+        finally:
+            for task, variant in pending.items():
+                workflow.logger.info("Cancelling variant %r", variant)
+                task.cancel()
 
-        return await workflow.execute_child_workflow(
-            cls,
-            common.PartInput(data.input_data),
-            id=f"run-{data.task_id}",
-            task_queue=common.TASK_QUEUE_NAME,
+        if winner is None:
+            msg = f"All variants of day {data.problem.day} {data.part} failed"
+            raise exceptions.ApplicationError(msg, non_retryable=True)
+        variant, answer = winner
+        seconds = (workflow.now() - start).total_seconds()
+        workflow.logger.info(
+            "Variant %r of day %s %s won in %.3fs",
+            variant,
+            data.problem.day,
+            data.part,
+            seconds,
+        )
+        await workflow.execute_activity_method(
+            self.record_variant,
+            _VariantResult(
+                data.problem.day,
+                str(data.part),
+                data.input_ref,
+                variant,
+                seconds,
+                failures,
+            ),
+            start_to_close_timeout=_MEMO_ACTIVITY_TIMEOUT,
         )
+        return answer
+
+    @activity.defn
+    async def lookup_answer(self, key: _MemoKey) -> _Memo:
+        """Look up the answer from a previous run.
+
+        The answer is keyed by the day, part, input, and a hash of the
+        solution's source (see _solution_source_hash()). The returned
+        memo can be passed to store_answer() to save a new answer under
+        the same key.
+        """
+        memo = _Memo(key, _solution_source_hash(key.day))
+        with contextlib.suppress(FileNotFoundError):
+            entry = json.loads(memo.path.read_text())
+            if key.fast or not entry["fast"]:
+                memo.answer = entry["answer"]
+        return memo
+
+    @activity.defn
+    async def store_answer(self, memo: _Memo) -> None:
+        memo.path.parent.mkdir(parents=True, exist_ok=True)
+        memo.path.write_text(
+            json.dumps({"answer": memo.answer, "fast": memo.key.fast})
+        )
+
+    @activity.defn
+    async def record_variant(self, result: _VariantResult) -> None:
+        VARIANTS_PATH.parent.mkdir(parents=True, exist_ok=True)
+        with VARIANTS_PATH.open("a") as variants:
+            variants.write(json.dumps(dataclasses.asdict(result)) + "\n")
 
 
 @dataclasses.dataclass
-class RunExamplesInput:
-    problem: SolveInput
+class ExampleResult:
+    index: int
+    expected: str
+    actual: str | None = None
+    error: str | None = None
+
+    @property
+    def passed(self) -> bool:
+        return self.error is None and self.actual == self.expected
+
+    def __str__(self) -> str:
+        if self.error is not None:
+            return f"example #{self.index + 1} raised {self.error}"
+        return (
+            f"example #{self.index + 1}: {self.actual!r} "
+            f"{'==' if self.passed else '!='} {self.expected!r}"
+        )
+
+
+@dataclasses.dataclass
+class _ExampleCase:
+    index: int
+    data: common.PartInput
+    expected: str
+
+
+@dataclasses.dataclass
+class _CheckExamplesInput:
+    day: int
     part: _PartDescriptor
+    func_name: str
+    cases: list[_ExampleCase]
+    fail_fast: bool = False
+
+
+_CHECK_EXAMPLES_TIMEOUT = datetime.timedelta(minutes=5)
+
+
+@activity.defn
+def check_function_examples(data: _CheckExamplesInput) -> list[ExampleResult]:
+    """Check a function solution against all of a part's examples."""
+    func = _get_solution(data.day, data.func_name)
+    results = []
+    for case in data.cases:
+        try:
+            actual = _call_function(func, case.data, common.Progress())
+        except Exception as err:  # noqa: BLE001
+            results.append(
+                ExampleResult(
+                    case.index,
+                    case.expected,
+                    error=f"{type(err).__name__}: {err}",
+                )
+            )
+        else:
+            results.append(ExampleResult(case.index, case.expected, actual))
+        if data.fail_fast and not results[-1].passed:
+            break
+    return results
+
+
+async def check_examples(
+    name: str,
+    day: int,
+    part: _PartDescriptor,
+    examples: list[Example],
+    *,
+    fail_fast: bool = False,
+) -> list[ExampleResult]:
+    """Check a solution named by _get_variants() against examples.
+
+    Examples are small, so rather than starting a workflow or activity
+    per example, workflow classes are run inline in the calling
+    workflow, and functions are all checked in one
+    check_function_examples activity. With fail_fast, checking stops
+    at the first failure.
+    """
+    cases = []
+    for i, example in enumerate(examples):
+        expected = part.get_answer(example)
+        if expected is not None:
+            workflow.logger.info(
+                "Checking %s against example #%s", part, i + 1
+            )
+            workflow.logger.debug(
+                "Example #%s input: %r", i + 1, example.input_data
+            )
+            workflow.logger.debug("Example #%s expected: %r", i + 1, expected)
+            cases.append(
+                _ExampleCase(
+                    i,
+                    common.PartInput(example.input_data, example.extra),
+                    expected,
+                )
+            )
+    if not cases:
+        return []
+
+    solution = _get_solution(day, name)
+    if not isinstance(solution, type):
+        return await workflow.execute_activity(
+            check_function_examples,
+            _CheckExamplesInput(day, part, name, cases, fail_fast),
+            task_queue=common.TASK_QUEUE_NAME,
+            start_to_close_timeout=_CHECK_EXAMPLES_TIMEOUT,
+            retry_policy=common.NEVER_RETRY,
+        )
+
+    results = []
+    for case in cases:
+        try:
+            actual = await solution().run(case.data)
+        except Exception as err:  # noqa: BLE001
+            results.append(
+                ExampleResult(
+                    case.index,
+                    case.expected,
+                    error=f"{type(err).__name__}: {err}",
+                )
+            )
+        else:
+            results.append(
+                ExampleResult(case.index, case.expected, str(actual))
+            )
+        if fail_fast and not results[-1].passed:
+            break
+    return results
+
+
+def _raise_for_failures(
+    part: _PartDescriptor, results: list[ExampleResult]
+) -> None:
+    if failures := [result for result in results if not result.passed]:
+        raise exceptions.ApplicationError(
+            f"Wrong answer for {part} "
+            + ", ".join(str(failure) for failure in failures),
+            non_retryable=True,
+        )
+
+
+@dataclasses.dataclass
+class PrefetchInput:
+    session_token: str
+    # If None, prefetch the puzzle that unlocked when the workflow started
+    day: int | None = None
+
+
+# Puzzles unlock at midnight EST, which is 05:00 UTC
+UNLOCK_TIMEZONE = datetime.timezone(datetime.timedelta(hours=-5))
+# Retry until the puzzle unlocks, backing off in case AOC is struggling
+_PREFETCH_RETRY = temporalio.common.RetryPolicy(
+    initial_interval=datetime.timedelta(seconds=5),
+    maximum_interval=datetime.timedelta(minutes=2),
+)
+_PREFETCH_TIMEOUT = datetime.timedelta(hours=1)
+
+
+@workflow.defn
+class Prefetch:
+    """Fetch a puzzle's input and examples into the local cache.
+
+    This is meant to run from a schedule at unlock time (see
+    cli.py prefetch --schedule), so that the first Solve of the day
+    reads from disk rather than waiting on AOC when it's busiest.
+    """
+
+    @workflow.run
+    async def run(self, data: PrefetchInput) -> str:
+        day = data.day or workflow.now().astimezone(UNLOCK_TIMEZONE).day
+        problem = SolveInput(day, data.session_token)
+        workflow.logger.info("Prefetching day %s", day)
+        input_ref, _ = await asyncio.gather(
+            *(
+                workflow.execute_activity_method(
+                    method,
+                    problem,
+                    task_queue=common.IO_TASK_QUEUE_NAME,
+                    retry_policy=_PREFETCH_RETRY,
+                    start_to_close_timeout=_AOC_API_ACTIVITY_TIMEOUT,
+                    schedule_to_close_timeout=_PREFETCH_TIMEOUT,
+                )
+                for method in (Solve.fetch_input_data, Solve.fetch_examples)
+            )
+        )
+        return input_ref
+
+
+@dataclasses.dataclass
+class SolveManyInput:
+    days: list[int]
+    session_token: str
+    fast: bool = False
+    concurrent: bool = False
+    fail_fast: bool = False
+    force: bool = False
+    max_concurrent: int = 4
+    local_activities: bool = False
+    # Reuse the results of days solved within this many seconds
+    reuse_window: float = 0
+    # See SolveInput; passed on to each day's Solve
+    nonce: str | None = None
 
     @property
     def task_id(self) -> str:
         return _get_task_id(
             self,
-            prob=self.problem,
-            part=self.part,
+            days=self.days,
+            fast=self.fast,
+            tok=self.session_token[0:6],
+            **({"nonce": self.nonce} if self.nonce else {}),
         )
 
 
 @dataclasses.dataclass
-class Example:
-    """AOC example class.
+class DayResult:
+    day: int
+    answers: list[tuple[_PartDescriptor, str | None]]
+    seconds: float
+    error: str | None = None
+    # See SolveOutput
+    submitted: int = 0
+    skipped: int = 0
 
-    AOCD returns examples as NamedTuples, which get cast to lists when
-    JSONified. This provides a way to turn them into dataclasses,
-    which get turned into dicts.
 
-    This also just retains a single answer -- the answer to the part
-    we care about -- to reduce the data passed back from the
-    fetch_examples activity.
-    """
-
-    input_data: str
-    answer: str | None = None
-    extra: dict[str, Any] | None = None
+@dataclasses.dataclass
+class SolveManyOutput:
+    results: list[DayResult]
 
 
 @workflow.defn
-class RunExamples:
+class SolveMany:
+    """Solve several days, running at most max_concurrent at once."""
+
     @workflow.run
-    async def run(self, data: RunExamplesInput) -> None:
-        try:
-            cls = _get_workflow_class(data.part, data.problem.day)
-        except AttributeError:
-            return
-
-        examples = await execute_aoc_activity(self.fetch_examples, data)
-        workflows = []
-        for i, example in enumerate(examples):
-            if example.answer is not None:
-                workflow.logger.info(
-                    "Checking %s against example #%s", data.part, i + 1
-                )
-                workflow.logger.debug(
-                    "Example #%s input: %r", i + 1, example.input_data
-                )
-                workflow.logger.debug(
-                    "Example #%s expected: %r", i + 1, example.answer
-                )
-                ex_data = common.PartInput(example.input_data, example.extra)
-                workflow.logger.debug(
-                    "Invoking child workflow %s with %s",
-                    cls,
-                    ex_data,
+    async def run(self, data: SolveManyInput) -> SolveManyOutput:
+        semaphore = asyncio.Semaphore(data.max_concurrent)
+        results = await asyncio.gather(
+            *(self._solve_day(data, day, semaphore) for day in data.days)
+        )
+        return SolveManyOutput(list(results))
+
+    async def _solve_day(
+        self, data: SolveManyInput, day: int, semaphore: asyncio.Semaphore
+    ) -> DayResult:
+        async with semaphore:
+            solve_input = SolveInput(
+                day,
+                data.session_token,
+                fast=data.fast,
+                concurrent=data.concurrent,
+                fail_fast=data.fail_fast,
+                force=data.force,
+                nonce=data.nonce,
+                local_activities=data.local_activities,
+            )
+            start = workflow.now()
+            try:
+                output = await execute_child_or_attach(
+                    Solve.run,
+                    solve_input,
+                    workflow_id=solve_input.task_id,
+                    result_type=SolveOutput,
+                    reuse_window=0 if data.force else data.reuse_window,
                 )
-                workflows.append(
-                    (
-                        workflow.execute_child_workflow(
-                            cls,
-                            ex_data,
-                            task_queue=common.TASK_QUEUE_NAME,
-                            id=f"example-{i}-{data.task_id}",
-                        ),
-                        example.answer,
-                    ),
+            except (
+                exceptions.ChildWorkflowError,
+                exceptions.ActivityError,
+                exceptions.ApplicationError,
+            ) as err:
+                error = err.cause or err
+                workflow.logger.warning("Day %s failed: %s", day, error)
+                return DayResult(
+                    day,
+                    [],
+                    (workflow.now() - start).total_seconds(),
+                    str(error),
                 )
-        for wf, expected in workflows:
-            actual = await wf
-            assert actual == expected, (
-                f"Wrong answer for {data.part} example #{i + 1}: "
-                f"{actual!r} != {expected!r}"
+            return DayResult(
+                day,
+                output.answers,
+                (workflow.now() - start).total_seconds(),
+                submitted=output.submitted,
+                skipped=output.skipped,
             )
-
-    @activity.defn
-    async def fetch_examples(self, data: RunExamplesInput) -> list[Example]:
-        retval = [
-            Example(ex.input_data, data.part.get_answer(ex), ex.extra)
-            for ex in aocd.get_puzzle(
-                session=data.problem.session_token,
-                day=data.problem.day,
-                year=common.YEAR,
-            ).examples
-        ]
-        activity.logger.info("Fetched %s examples: %s", len(retval), retval)
-        return retval